@@ -0,0 +1,56 @@
+import pygame
+from engine import NBodyEngine
+
+class Body:
+    # thin view onto one row of the engine arrays
+    def __init__(self, engine: NBodyEngine, x: float, y: float, mass: float, vel: pygame.Vector2, color: tuple, radius: float) -> None:
+        self.engine = engine
+        self.index = engine.addBody(x, y, mass, (vel.x, vel.y), radius)
+        self.color = color
+        # the engine updates the index when bodies are removed, and sets it to None if this one merged away
+        engine.views[self.index] = self
+
+    @property
+    def isAlive(self) -> bool:
+        return self.index is not None
+
+    @property
+    def pos(self) -> pygame.Vector2:
+        return pygame.Vector2(*self.engine.pos[self.index])
+
+    @pos.setter
+    def pos(self, value) -> None:
+        self.engine.pos[self.index] = (value[0], value[1])
+
+    @property
+    def vel(self) -> pygame.Vector2:
+        return pygame.Vector2(*self.engine.vel[self.index])
+
+    @vel.setter
+    def vel(self, value) -> None:
+        self.engine.vel[self.index] = (value[0], value[1])
+
+    @property
+    def x(self) -> float:
+        return float(self.engine.pos[self.index, 0])
+
+    @property
+    def y(self) -> float:
+        return float(self.engine.pos[self.index, 1])
+
+    @property
+    def mass(self) -> float:
+        return float(self.engine.mass[self.index])
+
+    @mass.setter
+    def mass(self, value: float) -> None:
+        self.engine.mass[self.index] = value
+        self.engine.markChanged([self.index])
+
+    @property
+    def radius(self) -> float:
+        return float(self.engine.radius[self.index])
+
+    @radius.setter
+    def radius(self, value: float) -> None:
+        self.engine.radius[self.index] = value
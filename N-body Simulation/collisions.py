@@ -0,0 +1,54 @@
+import numpy as np
+
+
+class MergeEvent:
+    # one group of overlapping bodies that became a single body
+    def __init__(self, survivorIndex: int, survivorView, absorbedViews: list, absorbedIds: np.ndarray, mass: float, radius: float, energyChange: float) -> None:
+        self.survivorIndex = survivorIndex
+        self.survivorView = survivorView
+        self.absorbedViews = absorbedViews
+        self.absorbedIds = absorbedIds
+        self.mass = mass
+        self.radius = radius
+        # kinetic energy is lost in a perfectly inelastic merger, potential energy changes slightly as well
+        self.energyChange = energyChange
+
+
+def findOverlappingPairs(pos: np.ndarray, radius: np.ndarray) -> tuple:
+    # sort-and-sweep broadphase along x, then an exact circle test on the candidate pairs
+    if len(pos) < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    order = np.argsort(pos[:, 0] - radius, kind="stable")
+    minX = (pos[:, 0] - radius)[order]
+    maxX = (pos[:, 0] + radius)[order]
+
+    # in sorted order every body only has to be checked against the following bodies whose interval starts before it ends
+    sortedIndices = np.arange(len(pos))
+    candidateCounts = np.searchsorted(minX, maxX, side="right") - sortedIndices - 1
+    candidateCounts = np.maximum(candidateCounts, 0)
+    first = np.repeat(sortedIndices, candidateCounts)
+    offsets = np.arange(len(first)) - np.repeat(np.cumsum(candidateCounts) - candidateCounts, candidateCounts)
+    second = first + 1 + offsets
+
+    i, j = order[first], order[second]
+    vecBetween = pos[i] - pos[j]
+    radiusSum = radius[i] + radius[j]
+    overlapping = np.einsum("ij,ij->i", vecBetween, vecBetween) < radiusSum**2
+
+    return i[overlapping], j[overlapping]
+
+
+def groupPairs(numBodies: int, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    # connected components of the overlap graph, every body is labelled with the smallest index in its group
+    labels = np.arange(numBodies)
+    while True:
+        smallerLabel = np.minimum(labels[i], labels[j])
+        newLabels = labels.copy()
+        np.minimum.at(newLabels, i, smallerLabel)
+        np.minimum.at(newLabels, j, smallerLabel)
+        # pointer jumping shortens long chains
+        newLabels = newLabels[newLabels]
+        if np.array_equal(newLabels, labels):
+            return labels
+        labels = newLabels
@@ -0,0 +1,329 @@
+import numpy as np
+from quadtree import calcBarnesHutAccelerations
+from collisions import MergeEvent, findOverlappingPairs, groupPairs
+# integrators.py lives in the repository root, the entry scripts put it on the path (see rootPath.py)
+from integrators import getIntegrator
+
+GRAVITY_SOLVERS = ("direct", "barnes-hut", "auto")
+# "auto" switches from direct summation to Barnes-Hut above this many bodies
+AUTO_SOLVER_THRESHOLD = 1500
+
+
+def calcDirectAccelerations(pos: np.ndarray, mass: np.ndarray, gravitConstant: float, softeningParameter: float, chunkSize: int = 1024, targets: np.ndarray = None) -> np.ndarray:
+    # softened all-pairs gravity, rows are processed in chunks to bound memory for large N
+    targets = np.arange(len(pos)) if targets is None else np.asarray(targets)
+    acc = np.empty((len(targets), 2))
+    posX, posY = pos[:, 0], pos[:, 1]
+    softeningSquared = softeningParameter**2
+
+    for start in range(0, len(targets), chunkSize):
+        rows = targets[start:start + chunkSize]
+        dx = posX[None, :] - posX[rows, None]
+        dy = posY[None, :] - posY[rows, None]
+        distSquared = dx * dx + dy * dy + softeningSquared
+        with np.errstate(divide="ignore"):
+            weight = mass[None, :] / (distSquared * np.sqrt(distSquared))
+        # a body does not attract itself
+        weight[np.arange(len(rows)), rows] = 0.0
+        acc[start:start + len(rows), 0] = np.einsum("ij,ij->i", weight, dx)
+        acc[start:start + len(rows), 1] = np.einsum("ij,ij->i", weight, dy)
+
+    return gravitConstant * acc
+
+
+def calcPotentialEnergy(pos: np.ndarray, mass: np.ndarray, gravitConstant: float, softeningParameter: float, chunkSize: int = 1024) -> float:
+    # softened pair potential, consistent with the softened force
+    potentialEnergy = 0.0
+    posX, posY = pos[:, 0], pos[:, 1]
+    softeningSquared = softeningParameter**2
+
+    for start in range(0, len(pos), chunkSize):
+        stop = min(start + chunkSize, len(pos))
+        dx = posX[None, start:] - posX[start:stop, None]
+        dy = posY[None, start:] - posY[start:stop, None]
+        with np.errstate(divide="ignore"):
+            invDist = 1.0 / np.sqrt(dx * dx + dy * dy + softeningSquared)
+        # count every pair once (j > i)
+        invDist[np.tril_indices(stop - start, m=len(pos) - start)] = 0.0
+        potentialEnergy -= gravitConstant * (mass[start:stop] @ invDist @ mass[start:])
+
+    return float(potentialEnergy)
+
+
+def calcInteractionEnergy(posA: np.ndarray, massA: np.ndarray, posB: np.ndarray, massB: np.ndarray, gravitConstant: float, softeningParameter: float, chunkSize: int = 1024) -> float:
+    # softened potential energy between two disjoint groups of bodies
+    interactionEnergy = 0.0
+    softeningSquared = softeningParameter**2
+
+    for start in range(0, len(posA), chunkSize):
+        stop = min(start + chunkSize, len(posA))
+        dx = posB[None, :, 0] - posA[start:stop, None, 0]
+        dy = posB[None, :, 1] - posA[start:stop, None, 1]
+        interactionEnergy -= gravitConstant * (massA[start:stop] @ (1.0 / np.sqrt(dx * dx + dy * dy + softeningSquared)) @ massB)
+
+    return float(interactionEnergy)
+
+
+class NBodyEngine:
+    def __init__(self, gravitConstant: float, softeningParameter: float, capacity: int = 64, gravitySolver: str = "direct", openingAngle: float = 0.5, integrator: str = "rk4") -> None:
+        if gravitySolver not in GRAVITY_SOLVERS:
+            raise ValueError(f"unknown gravity solver '{gravitySolver}', expected one of {GRAVITY_SOLVERS}")
+
+        self.gravitConstant = gravitConstant
+        self.softeningParameter = softeningParameter
+        # direct summation is exact but O(N^2), Barnes-Hut trades accuracy (set by the opening angle) for O(N log N)
+        self.gravitySolver = gravitySolver
+        self.openingAngle = openingAngle
+        self.integrator = getIntegrator(integrator)
+        self.count = 0
+        self.nextId = 0
+        # bodies whose radii overlap merge, onMerge(event) is called for every merged group
+        self.collisionsEnabled = True
+        self.onMerge = None
+        # views (Planet, Sun) by index, kept up to date when merged bodies are removed
+        self.views = {}
+        # bumped whenever bodies are added or their masses change, so caches know to rebuild
+        self.version = 0
+        # total energy when the system last changed, energy drift is measured against it
+        self.energyBaseline = None
+        self.energyBaselineVersion = None
+        self.maxEnergyDrift = 0.0
+        # struct-of-arrays storage, only the first `count` rows are live
+        self.posBuffer = np.zeros((capacity, 2))
+        self.velBuffer = np.zeros((capacity, 2))
+        self.massBuffer = np.zeros(capacity)
+        self.radiusBuffer = np.zeros(capacity)
+        # stable id of every body, indices change when merged bodies are removed
+        self.idBuffer = np.zeros(capacity, dtype=np.int64)
+        # version at which every body last changed, caches that only track some bodies check these
+        self.versionBuffer = np.zeros(capacity, dtype=np.int64)
+
+    @property
+    def pos(self) -> np.ndarray:
+        return self.posBuffer[:self.count]
+
+    @property
+    def vel(self) -> np.ndarray:
+        return self.velBuffer[:self.count]
+
+    @property
+    def mass(self) -> np.ndarray:
+        return self.massBuffer[:self.count]
+
+    @property
+    def radius(self) -> np.ndarray:
+        return self.radiusBuffer[:self.count]
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self.idBuffer[:self.count]
+
+    @property
+    def versions(self) -> np.ndarray:
+        return self.versionBuffer[:self.count]
+
+    def reserve(self, capacity: int) -> None:
+        if capacity <= len(self.massBuffer):
+            return
+
+        newCapacity = max(capacity, 2 * len(self.massBuffer))
+        for name in ("posBuffer", "velBuffer", "massBuffer", "radiusBuffer", "idBuffer", "versionBuffer"):
+            oldBuffer = getattr(self, name)
+            newBuffer = np.zeros((newCapacity,) + oldBuffer.shape[1:], dtype=oldBuffer.dtype)
+            newBuffer[:self.count] = oldBuffer[:self.count]
+            setattr(self, name, newBuffer)
+
+    def addBody(self, x: float, y: float, mass: float, vel: tuple = (0.0, 0.0), radius: float = 1.0) -> int:
+        self.reserve(self.count + 1)
+        index = self.count
+        self.posBuffer[index] = (x, y)
+        self.velBuffer[index] = vel
+        self.massBuffer[index] = mass
+        self.radiusBuffer[index] = radius
+        self.idBuffer[index] = self.nextId
+        self.nextId += 1
+        self.count += 1
+        self.markChanged([index])
+
+        return index
+
+    def addBodies(self, pos: np.ndarray, mass: np.ndarray, vel: np.ndarray = None, radius: np.ndarray = 1.0) -> np.ndarray:
+        # bulk append straight into the arrays, returns the new indices
+        pos = np.asarray(pos, dtype=float).reshape(-1, 2)
+        numBodies = len(pos)
+        self.reserve(self.count + numBodies)
+        indices = np.arange(self.count, self.count + numBodies)
+        self.posBuffer[indices] = pos
+        self.velBuffer[indices] = 0.0 if vel is None else vel
+        self.massBuffer[indices] = mass
+        self.radiusBuffer[indices] = radius
+        self.idBuffer[indices] = np.arange(self.nextId, self.nextId + numBodies)
+        self.nextId += numBodies
+        self.count += numBodies
+        self.markChanged(indices)
+
+        return indices
+
+    def markChanged(self, indices=None) -> None:
+        # without indices every body counts as changed
+        self.version += 1
+        if indices is None:
+            self.versions[:] = self.version
+        else:
+            self.versionBuffer[indices] = self.version
+
+    def findBodyAt(self, x: float, y: float, margin: float = 0.0, indices=None) -> int:
+        # nearest body whose radius (plus margin) contains the point, -1 if there is none
+        indices = np.arange(self.count) if indices is None else np.asarray(indices, dtype=np.int64)
+        if len(indices) == 0:
+            return -1
+
+        distSquared = np.sum((self.pos[indices] - (x, y))**2, axis=1)
+        hits = distSquared < (self.radius[indices] + margin)**2
+        if not np.any(hits):
+            return -1
+        return int(indices[hits][np.argmin(distSquared[hits])])
+
+    def calcAccelerations(self, pos: np.ndarray) -> np.ndarray:
+        useBarnesHut = self.gravitySolver == "barnes-hut" or (self.gravitySolver == "auto" and self.count > AUTO_SOLVER_THRESHOLD)
+        if useBarnesHut:
+            return calcBarnesHutAccelerations(pos, self.mass, self.gravitConstant, self.softeningParameter, self.openingAngle)
+        return calcDirectAccelerations(pos, self.mass, self.gravitConstant, self.softeningParameter)
+
+    def setCircularVelocity(self, index: int, centralIndex: int) -> None:
+        self.setOrbitalVelocities(np.array([index]), centralIndex)
+
+    def setOrbitalVelocities(self, indices: np.ndarray, centralIndex: int, eccentricity=0.0, trueAnomaly=0.0) -> None:
+        # velocity of a Kepler orbit around the central body through every body's current position,
+        # eccentricity 0 gives circular orbits
+        vecCentralToBody = self.pos[indices] - self.pos[centralIndex]
+        dist = np.hypot(vecCentralToBody[:, 0], vecCentralToBody[:, 1])
+        radialDir = vecCentralToBody / dist[:, None]
+        # to rotate clockwise
+        perpVecToR = np.stack((radialDir[:, 1], -radialDir[:, 0]), axis=1)
+
+        # semi-latus rectum from r = p / (1 + e cos f), then the radial and tangential speeds of the orbit
+        semiLatusRectum = dist * (1 + eccentricity * np.cos(trueAnomaly))
+        speedScale = np.sqrt(self.gravitConstant * self.mass[centralIndex] / semiLatusRectum)
+        radialSpeed = speedScale * eccentricity * np.sin(trueAnomaly)
+        tangentialSpeed = speedScale * (1 + eccentricity * np.cos(trueAnomaly))
+
+        self.vel[indices] += self.vel[centralIndex] + radialSpeed[:, None] * radialDir + tangentialSpeed[:, None] * perpVecToR
+        self.markChanged(indices)
+
+    def removeNetMomentum(self) -> None:
+        # keeps the whole system from drifting off screen now that the sun feels the planets too
+        totalMass = np.sum(self.mass)
+        if totalMass > 0:
+            self.vel[:] -= np.sum(self.mass[:, None] * self.vel, axis=0) / totalMass
+            self.markChanged()
+
+    def step(self, dt: float) -> None:
+        # one batched step of the selected integrator for every body
+        newPos, newVel = self.integrator.step(self.pos, self.vel, dt, self.calcAccelerations)
+        # in place so views stay valid
+        self.pos[:] = newPos
+        self.vel[:] = newVel
+
+        if self.collisionsEnabled:
+            self.resolveCollisions()
+
+    def removeBodies(self, removeMask: np.ndarray) -> np.ndarray:
+        # compacts the arrays in one pass and returns the new index of every old index (-1 if removed)
+        keep = ~removeMask
+        newCount = int(np.count_nonzero(keep))
+        for name in ("posBuffer", "velBuffer", "massBuffer", "radiusBuffer", "idBuffer", "versionBuffer"):
+            buffer = getattr(self, name)
+            buffer[:newCount] = buffer[:self.count][keep]
+
+        newIndices = np.where(keep, np.cumsum(keep) - 1, -1)
+        views = self.views
+        self.views = {}
+        for oldIndex, view in views.items():
+            view.index = int(newIndices[oldIndex]) if newIndices[oldIndex] >= 0 else None
+            if view.index is not None:
+                self.views[view.index] = view
+
+        self.count = newCount
+        # the remaining bodies themselves did not change
+        self.markChanged([])
+        return newIndices
+
+    def resolveCollisions(self) -> list:
+        first, second = findOverlappingPairs(self.pos, self.radius)
+        if len(first) == 0:
+            return []
+
+        labels = groupPairs(self.count, first, second)
+        involved = np.unique(np.concatenate((first, second)))
+        groupOf = labels[involved]
+        removeMask = np.zeros(self.count, dtype=bool)
+        merges = []
+
+        # groups are merged one after another so every event gets its exact energy change
+        for group in np.unique(groupOf):
+            members = involved[groupOf == group]
+            othersMask = ~removeMask
+            othersMask[members] = False
+            energyBefore = self.calcGroupEnergy(members, othersMask)
+
+            # the heaviest body survives, mass and momentum are conserved and volume is kept as if they were spheres
+            survivor = members[np.argmax(self.mass[members])]
+            absorbed = members[members != survivor]
+            mass = np.sum(self.mass[members])
+            self.pos[survivor] = np.sum(self.mass[members, None] * self.pos[members], axis=0) / mass
+            self.vel[survivor] = np.sum(self.mass[members, None] * self.vel[members], axis=0) / mass
+            self.radius[survivor] = np.cbrt(np.sum(self.radius[members]**3))
+            self.mass[survivor] = mass
+
+            energyAfter = self.calcGroupEnergy(np.array([survivor]), othersMask)
+            removeMask[absorbed] = True
+            absorbedViews = [self.views[int(index)] for index in absorbed if int(index) in self.views]
+            merges.append((survivor, absorbedViews, self.ids[absorbed].copy(), energyAfter - energyBefore))
+
+        wasMeasuringDrift = self.energyBaselineVersion == self.version
+        newIndices = self.removeBodies(removeMask)
+        # a merger changes the energy on purpose, so it is taken out of the drift measurement
+        if wasMeasuringDrift and self.energyBaseline is not None:
+            self.energyBaseline += sum(energyChange for _, _, _, energyChange in merges)
+            self.energyBaselineVersion = self.version
+
+        # only the survivors changed, the bodies they absorbed are gone
+        self.versionBuffer[newIndices[[survivor for survivor, _, _, _ in merges]]] = self.version
+
+        events = []
+        for survivor, absorbedViews, absorbedIds, energyChange in merges:
+            survivorIndex = int(newIndices[survivor])
+            event = MergeEvent(survivorIndex, self.views.get(survivorIndex), absorbedViews, absorbedIds,
+                               float(self.mass[survivorIndex]), float(self.radius[survivorIndex]), energyChange)
+            events.append(event)
+            if self.onMerge is not None:
+                self.onMerge(event)
+
+        return events
+
+    def calcGroupEnergy(self, indices: np.ndarray, othersMask: np.ndarray) -> float:
+        # energy of a group of bodies including their interaction with the rest, the rest-rest part cancels out
+        kineticEnergy = 0.5 * np.sum(self.mass[indices] * np.einsum("ij,ij->i", self.vel[indices], self.vel[indices]))
+        potentialEnergy = calcPotentialEnergy(self.pos[indices], self.mass[indices], self.gravitConstant, self.softeningParameter)
+        potentialEnergy += calcInteractionEnergy(self.pos[indices], self.mass[indices], self.pos[othersMask], self.mass[othersMask], self.gravitConstant, self.softeningParameter)
+        return float(kineticEnergy + potentialEnergy)
+
+    def calcEnergies(self) -> list:
+        # energy of motion (KE)
+        kineticEnergy = float(0.5 * np.sum(self.mass * np.einsum("ij,ij->i", self.vel, self.vel)))
+        # gravitational energy between every pair of bodies (PE)
+        potentialEnergy = calcPotentialEnergy(self.pos, self.mass, self.gravitConstant, self.softeningParameter)
+
+        return [kineticEnergy, potentialEnergy, kineticEnergy + potentialEnergy]
+
+    def measureEnergyDrift(self, totalEnergy: float) -> float:
+        # relative drift of the total energy since the system last changed
+        if self.energyBaselineVersion != self.version:
+            self.energyBaseline = totalEnergy
+            self.energyBaselineVersion = self.version
+            self.maxEnergyDrift = 0.0
+
+        drift = (totalEnergy - self.energyBaseline) / abs(self.energyBaseline) if self.energyBaseline else 0.0
+        self.maxEnergyDrift = max(self.maxEnergyDrift, abs(drift))
+        return drift
@@ -0,0 +1,76 @@
+import argparse
+import time
+import numpy as np
+# rootPath first so the shared modules in the repository root can be imported
+import rootPath
+import system
+from spawner import DiskSpec, spawnDisk
+
+# runs the same engine as main.py without pygame or a display, as fast as the CPU allows
+# usage: python headless.py --steps 100000 --dt 0.01 --output run.npz
+#        python headless.py --steps 2000 --disk 10000 --save-every 100 --output disk.npz
+
+def runHeadless(steps: int, dt: float, outputPath: str, saveEvery: int = 10, gravitySolver: str = system.GRAVITY_SOLVER,
+                openingAngle: float = system.OPENING_ANGLE, integrator: str = system.INTEGRATOR, diskBodies: int = 0, seed: int = None) -> dict:
+    engine = system.createEngine(gravitySolver, openingAngle, integrator)
+    sunIndex, planetIndices = system.createSolarSystem(engine)
+    system.setInitialVelocities(engine, sunIndex, planetIndices)
+    if diskBodies > 0:
+        spawnDisk(engine, sunIndex, DiskSpec(diskBodies, **system.DISK), np.random.default_rng(seed))
+
+    # bodies are stored by their stable id, rows of merged-away bodies stay NaN
+    numFrames = steps // saveEvery + 1
+    numBodies = engine.count
+    times = np.empty(numFrames)
+    positions = np.full((numFrames, numBodies, 2), np.nan)
+    velocities = np.full((numFrames, numBodies, 2), np.nan)
+    masses = np.full((numFrames, numBodies), np.nan)
+    energies = np.empty((numFrames, 3))
+    mergeEvents = []
+    engine.onMerge = lambda event: mergeEvents.append(event)
+
+    def record(frame: int, step: int) -> None:
+        times[frame] = step * dt
+        positions[frame, engine.ids] = engine.pos
+        velocities[frame, engine.ids] = engine.vel
+        masses[frame, engine.ids] = engine.mass
+        energies[frame] = engine.calcEnergies()
+        engine.measureEnergyDrift(energies[frame, 2])
+
+    record(0, 0)
+    start = time.perf_counter()
+    for step in range(1, steps + 1):
+        engine.step(dt)
+        if step % saveEvery == 0:
+            record(step // saveEvery, step)
+    wallTime = time.perf_counter() - start
+
+    np.savez(outputPath, time=times, pos=positions, vel=velocities, mass=masses, energies=energies,
+             dt=dt, integrator=engine.integrator.name, gravitySolver=engine.gravitySolver)
+
+    return {
+        "steps": steps,
+        "wallTime": wallTime,
+        "stepsPerSecond": steps / wallTime if wallTime > 0 else float("inf"),
+        "realtimeFactor": steps * dt / wallTime if wallTime > 0 else float("inf"),
+        "maxEnergyDrift": engine.maxEnergyDrift,
+        "mergers": len(mergeEvents),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless N-body run, writes state and energy series to an .npz file")
+    parser.add_argument("--steps", type=int, default=100000)
+    parser.add_argument("--dt", type=float, default=1 / 60)
+    parser.add_argument("--save-every", type=int, default=10)
+    parser.add_argument("--integrator", default=system.INTEGRATOR)
+    parser.add_argument("--solver", default=system.GRAVITY_SOLVER)
+    parser.add_argument("--theta", type=float, default=system.OPENING_ANGLE)
+    parser.add_argument("--disk", type=int, default=0, help="number of protoplanetary disk bodies around the sun")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default="nbody_run.npz")
+    args = parser.parse_args()
+
+    summary = runHeadless(args.steps, args.dt, args.output, args.save_every, args.solver, args.theta, args.integrator, args.disk, args.seed)
+    print(f"{summary['steps']} steps in {summary['wallTime']:.2f} s ({summary['stepsPerSecond']:.0f} steps/s, "
+          f"{summary['realtimeFactor']:.1f}x realtime), max energy drift {summary['maxEnergyDrift']:.2e}, {summary['mergers']} mergers, saved to {args.output}")
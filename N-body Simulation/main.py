@@ -4,35 +4,61 @@ from pygame_widgets import update
 import pygame_widgets
 import random
 
-# other scripts
+# other scripts, rootPath first so the shared modules in the repository root can be imported
+import rootPath
 import sun, popup, buttons, stars
 from planet import Planet
+from prediction import OrbitPredictor
 from utils import Utils
+from spawner import DiskSpec, spawnDisk
+from system import WIDTH, HEIGHT, SUN, PLANETS, DISK, createEngine, setInitialVelocities
+from timestep import FixedTimestep
+from polyline import simplifyPolyline
 
-WIDTH, HEIGHT = 1280, 720
-GRAVITATIONAL_CONSTANT = 2.0 # 0.5 to 2 is good
-SOFTENING_PARAMETER = 1.0 # prevents extreme accelerations at close approach
+PHYSICS_STEP_SIZE = 1 / 60
+PREDICTION_STEPS = 14000
+# bodies per disk spawned with D, kept small enough for the direct solver to step in a fraction of a frame
+# (Barnes-Hut only pays off above engine.AUTO_SOLVER_THRESHOLD bodies, see headless.py for large disks)
+DISK_BODIES = 200
+DISK_COLOR = (200, 200, 220)
+# predicted orbits are simplified to this many pixels of error and at most this many vertices
+PATH_TOLERANCE = 0.5
+PATH_MAX_VERTICES = 1024
+# seconds between two measurements of the energies and their drift, every one sums all pairs of bodies
+ENERGY_UPDATE_INTERVAL = 0.5
+
+# every body lives in the engine arrays, sun and planets are views into them
+engine = createEngine()
 
 # planets
-sunInstance = sun.Sun(WIDTH / 2, HEIGHT / 2, 10000, (255, 255, 0), 30)
-earth = Planet(790, 360, 10, pygame.Vector2(0, 0), (0, 102, 255), 6)
-jupiter = Planet(940, 360, 300, pygame.Vector2(0, 0), (255, 165, 0), 14)
-saturn = Planet(1090, 360, 200, pygame.Vector2(0, 0), (210, 180, 140), 12)
+sunInstance = sun.Sun(engine, **SUN)
+earth = Planet(engine, vel=pygame.Vector2(0, 0), **PLANETS["earth"])
+jupiter = Planet(engine, vel=pygame.Vector2(0, 0), **PLANETS["jupiter"])
+saturn = Planet(engine, vel=pygame.Vector2(0, 0), **PLANETS["saturn"])
 widgetButton = buttons.Buttons()
 particleStars = stars.Star()
 planets = [earth, jupiter, saturn]
 
 
 class Simulation:
-    def __init__(self) -> None:
+    def __init__(self, simSpeedMultiplier: float = 1.0) -> None:
         self.minDistanceToShowPopup = 10
         self.totalKineticEnergy = None
         self.totalPotentialEnergy = None
         self.totalEnergy = None
+        self.energyDrift = 0.0
+        self.energyUpdateTimer = 0.0
         self.tileSize = 60
         self.gridColor = "#2E2F4F"
-        self.maxPlanets = 4
-        self.currentPlanets = 3
+        # one predicted step per physics step, so the cached orbit stays in sync
+        self.orbitPredictor = OrbitPredictor(engine, PREDICTION_STEPS, PHYSICS_STEP_SIZE)
+        self.wasPaused = False
+        self.timestep = FixedTimestep(PHYSICS_STEP_SIZE, speedMultiplier=simSpeedMultiplier)
+        self.previousPos = engine.pos.copy()
+        # overlapping bodies merge inside the engine, the callback keeps the planet list and energy bookkeeping in sync
+        self.numMergers = 0
+        self.mergedEnergyChange = 0.0
+        engine.onMerge = self.onBodiesMerged
         
     def createGrid(self, screen) -> None:
         
@@ -45,17 +71,10 @@ class Simulation:
             pygame.draw.line(screen, self.gridColor, (0, y), (WIDTH, y))
     
     @staticmethod
-    def isMouseOnPlanet(scale: float = 2.0, minSize: int = 25) -> bool:
+    def isMouseOnBody(margin: float = 12.5) -> bool:
+        # one vectorized hit test against the sun and the planets
         mousePosX, mousePosY = Utils.getMousePos()
-        
-        for planet in planets:
-            # mouse rect size grows with planet size but never smaller than minSize
-            size = max(minSize, int(planet.radius * scale))
-            mouseRect = Utils.createMouseRect(mousePosX, mousePosY, size=size)
-            planetRect = Utils.createRect(planet.x, planet.y, planet.radius)
-            if pygame.Rect.colliderect(mouseRect, planetRect):
-                return True
-        return False        
+        return engine.findBodyAt(mousePosX, mousePosY, margin, indices=list(engine.views)) >= 0
     
     def spawnNewPlanet(self, planetList: list) -> None:
         # to spawn new planets
@@ -64,13 +83,25 @@ class Simulation:
         randRadius = random.randint(5, 15)
         mousePosX, mousePosY = pygame.mouse.get_pos()
         
-        # check that you can still create planets,  cursor is not on planets and on sun and on button
-        if (self.currentPlanets < self.maxPlanets) and (not self.isMouseOnPlanet()) and (not sunInstance.isMouseOnSun()) and (not widgetButton.isMouseOnButton()):
-            newPlanet = Planet(mousePosX, mousePosY, randMass, pygame.Vector2(0, 0), newPlanetColor, randRadius)
-            newPlanet.setInitialVelocity(sunInstance.pos, sunInstance.mass, GRAVITATIONAL_CONSTANT)
+        # check that the cursor is not on a planet, on the sun or on a button
+        if (not self.isMouseOnBody()) and (not widgetButton.isMouseOnButton()):
+            newPlanet = Planet(engine, mousePosX, mousePosY, randMass, pygame.Vector2(0, 0), newPlanetColor, randRadius)
+            newPlanet.setInitialVelocity(sunInstance.index)
             planetList.append(newPlanet)
-            self.currentPlanets += 1
+
+    def spawnDisk(self, numBodies: int = DISK_BODIES) -> None:
+        # disk bodies only live in the engine arrays, there is no Planet object for them
+        if sunInstance.isAlive:
+            spawnDisk(engine, sunInstance.index, DiskSpec(numBodies, **DISK))
     
+    def onBodiesMerged(self, event) -> None:
+        for view in event.absorbedViews:
+            if view in planets:
+                planets.remove(view)
+        # kinetic energy lost and binding energy released by mergers, the drift metric already accounts for it
+        self.numMergers += 1
+        self.mergedEnergyChange += event.energyChange
+
     def createPlanetPopup(self, font, screen):
         mousePosX, mousePosY = Utils.getMousePos()
         for planet in planets:
@@ -79,41 +110,84 @@ class Simulation:
                 popupText = popup.Popup(text=f"X: {np.round(planet.pos.x, 2)} - Y: {np.round(planet.pos.y, 2)}")
                 popupText.createPopup(font, planet.color, screen, planet.pos, pygame.Vector2(-60, -60))
 
-    def updatePlanetPositions(self, dt, screen) -> None:
-        if sunInstance is not None and planets[0] is not None and planets[1] is not None and planets[2] is not None:
-            sunInstance.drawSun(screen)
-            for planet in planets:
-                planet.drawPlanet(screen)
-                planetPath = planet.calcFuturePlanetPos(sunInstance.pos, sunInstance.mass, GRAVITATIONAL_CONSTANT, SOFTENING_PARAMETER, dt, steps=14000)
-                pygame.draw.lines(screen, planet.color, False, planetPath, 1)
-                if not widgetButton.isPaused:
-                    planet.updatePosRungeKutta(sunInstance.pos, sunInstance.mass, GRAVITATIONAL_CONSTANT, SOFTENING_PARAMETER, dt)        
+    def updatePlanetPositions(self, frameTime, screen) -> None:
+        if not sunInstance.isAlive:
+            return
+
+        # predicted orbits are cached and only fully recomputed when the system changes
+        if widgetButton.isPaused != self.wasPaused:
+            self.wasPaused = widgetButton.isPaused
+            self.orbitPredictor.invalidate()
+            self.timestep.reset()
+        # planets can all merge into the sun, the sun and the disk keep moving without them
+        if planets:
+            self.orbitPredictor.update([sunInstance.index] + [planet.index for planet in planets])
+
+        # fixed physics substeps, one batched integrator step for every body, sun included
+        substeps = () if widgetButton.isPaused else self.timestep.substeps(frameTime)
+        for _ in substeps:
+            self.previousPos = engine.pos.copy()
+            engine.step(self.timestep.stepSize)
+            self.orbitPredictor.advance(self.timestep.stepSize)
+        if self.previousPos.shape != engine.pos.shape:
+            self.previousPos = engine.pos.copy()
+
+        # draw between the last two physics states
+        renderPos = self.timestep.interpolate(self.previousPos, engine.pos, self.timestep.alpha)
+        self.drawDiskBodies(screen, renderPos)
+        sunInstance.drawSun(screen, renderPos[sunInstance.index])
+        for planet in planets:
+            planet.drawPlanet(screen, renderPos[planet.index])
+            planetPath = simplifyPolyline(self.orbitPredictor.getPath(planet.index), PATH_TOLERANCE, PATH_MAX_VERTICES)
+            if len(planetPath) >= 2:
+                pygame.draw.lines(screen, planet.color, False, planetPath.tolist(), 1)
+
+    @staticmethod
+    def drawDiskBodies(screen: pygame.Surface, renderPos: np.ndarray) -> None:
+        # bodies without a view are drawn as single pixels straight into the screen array
+        isDiskBody = np.ones(engine.count, dtype=bool)
+        isDiskBody[list(engine.views)] = False
+        pixelPos = renderPos[isDiskBody].astype(np.int64)
+        onScreen = (pixelPos[:, 0] >= 0) & (pixelPos[:, 0] < WIDTH) & (pixelPos[:, 1] >= 0) & (pixelPos[:, 1] < HEIGHT)
+        pixelPos = pixelPos[onScreen]
+        if len(pixelPos) == 0:
+            return
+
+        pixels = pygame.surfarray.pixels2d(screen)
+        pixels[pixelPos[:, 0], pixelPos[:, 1]] = screen.map_rgb(DISK_COLOR)
+        del pixels
 
     def calcTotalPlanetEnergies(self) -> list:
-        # energy of motion (KE)
-        totalKineticEnergy = sum([0.5 * planet.mass * planet.vel.length_squared() for planet in planets])
-        # gravitational energy between bodies (PE)
-        totalPotentialEnergy = sum([-(GRAVITATIONAL_CONSTANT * sunInstance.mass * planet.mass) / planet.pos.distance_to(sunInstance.pos) for planet in planets])
-        # total energy (TE)
-        totalEnergy = totalKineticEnergy + totalPotentialEnergy
-
-        return [totalKineticEnergy, totalPotentialEnergy, totalEnergy]
-
-    def displayEnergiesText(self, screen: pygame.Surface , font: pygame.font.SysFont) -> None:
-        kineticEnergySurface = font.render(f"Total Kinetic Energy: {np.round(self.calcTotalPlanetEnergies()[0], 2)}", True, (255, 215, 0))
-        potentialEnergySurface = font.render(f"Total Potential Energy: {np.round(self.calcTotalPlanetEnergies()[1], 2)}", True, (255, 215, 0))
-        totalEnergySurface = font.render(f"Total Energy: {np.round(self.calcTotalPlanetEnergies()[2], 2)}", True, (255, 215, 0))
+        # [KE, PE, TE] of the whole system, all pairs included
+        return engine.calcEnergies()
+
+    def updateEnergies(self, frameTime: float) -> None:
+        # measured every ENERGY_UPDATE_INTERVAL instead of every frame, the texts show the last measurement
+        self.energyUpdateTimer -= frameTime
+        if self.totalEnergy is not None and self.energyUpdateTimer > 0:
+            return
+        self.energyUpdateTimer = ENERGY_UPDATE_INTERVAL
+        self.totalKineticEnergy, self.totalPotentialEnergy, self.totalEnergy = self.calcTotalPlanetEnergies()
+        self.energyDrift = engine.measureEnergyDrift(self.totalEnergy)
+
+    def displayEnergiesText(self, screen: pygame.Surface , font: pygame.font.SysFont, frameTime: float) -> None:
+        self.updateEnergies(frameTime)
+        kineticEnergySurface = font.render(f"Total Kinetic Energy: {np.round(self.totalKineticEnergy, 2)}", True, (255, 215, 0))
+        potentialEnergySurface = font.render(f"Total Potential Energy: {np.round(self.totalPotentialEnergy, 2)}", True, (255, 215, 0))
+        totalEnergySurface = font.render(f"Total Energy: {np.round(self.totalEnergy, 2)}", True, (255, 215, 0))
+        energyDriftSurface = font.render(f"Energy Drift: {self.energyDrift:+.2e} (max {engine.maxEnergyDrift:.2e}) - Mergers: {self.numMergers} (energy change {np.round(self.mergedEnergyChange, 2)})", True, (255, 215, 0))
         screen.blit(kineticEnergySurface, (40, 30))
         screen.blit(potentialEnergySurface, (40, 70))
         screen.blit(totalEnergySurface, (40, 110))
+        screen.blit(energyDriftSurface, (40, 150))
 
     def updateSimulation(self) -> None:
         pygame.init()
         screen = pygame.display.set_mode((WIDTH, HEIGHT))
-        pygame.display.set_caption("N-body Simulation")
         clock = pygame.time.Clock()
         running = True
         dt = 0
+        pygame.display.set_caption(f"N-body Simulation (x{self.timestep.speedMultiplier:g})")
         
         popupFont = pygame.font.SysFont("Anonymous", 18)
         textFont = pygame.font.SysFont("Anonymous", 20)
@@ -124,6 +198,12 @@ class Simulation:
             for event in events:
                 if event.type == pygame.QUIT:
                     running = False    
+                # UP / DOWN changes the simulation speed
+                if self.timestep.handleSpeedKeys(event):
+                    pygame.display.set_caption(f"N-body Simulation (x{self.timestep.speedMultiplier:g})")
+                # D adds a protoplanetary disk around the sun
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_d:
+                    self.spawnDisk()
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     if event.button == 1:
                         self.spawnNewPlanet(planets)
@@ -131,7 +211,7 @@ class Simulation:
             screen.fill("#0B0C2A")
             self.createGrid(screen)
             self.updatePlanetPositions(dt, screen)    
-            self.displayEnergiesText(screen, textFont)
+            self.displayEnergiesText(screen, textFont, dt)
             self.createPlanetPopup(popupFont, screen)
             particleStars.createStars(dt, screen, WIDTH, HEIGHT)
             pygame_widgets.update(events)            
@@ -143,7 +223,6 @@ class Simulation:
 
 if __name__ == "__main__":
     simulation = Simulation()
-    for planet in planets:
-        planet.setInitialVelocity(sunInstance.pos, sunInstance.mass, GRAVITATIONAL_CONSTANT)
-    
+    setInitialVelocities(engine, sunInstance.index, [planet.index for planet in planets])
+
     simulation.updateSimulation()
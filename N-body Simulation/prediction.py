@@ -0,0 +1,137 @@
+import time
+import numpy as np
+from engine import NBodyEngine
+
+class OrbitPredictor:
+    # ring buffer of future positions for a set of tracked bodies, predicted together
+    def __init__(self, engine: NBodyEngine, steps: int = 14000, stepSize: float = 1 / 60) -> None:
+        self.engine = engine
+        self.steps = steps
+        self.stepSize = stepSize
+        self.indices = np.zeros(0, dtype=np.int64)
+        self.slots = {}
+        self.buffer = None
+        self.velBuffer = None
+        self.head = 0
+        # predicted steps in the buffer from head on, after a recompute the buffer is filled over the next frames
+        self.numPredicted = 0
+        # wall time one update may spend predicting, a full buffer takes a few hundred ms
+        self.maxFillTime = 0.004
+        self.tailPos = None
+        self.tailVel = None
+        self.mass = None
+        # predicted state at the engine's current time, to tell small changes (accreting a disk body) from real ones
+        self.currentPos = None
+        self.currentVel = None
+        self.positionTolerance = 1.0
+        self.relativeTolerance = 0.01
+        self.elapsed = 0.0
+        # the cheap prediction drifts from the engine (another integrator, disk bodies are ignored), so it is compared
+        # with the live state every syncInterval predicted steps and recomputed once it is out of tolerance
+        self.syncInterval = 60
+        self.stepsSinceSyncCheck = 0
+        self.engineVersion = -1
+        self.isValid = False
+
+    def invalidate(self) -> None:
+        self.isValid = False
+
+    def predictStep(self, pos: np.ndarray, vel: np.ndarray) -> tuple:
+        # semi-implicit Euler, cheap and stable enough for drawing
+        vecToOthers = pos[None, :, :] - pos[:, None, :]
+        distSquared = np.sum(vecToOthers**2, axis=2) + self.engine.softeningParameter**2
+        weight = self.mass[None, :] / (distSquared * np.sqrt(distSquared))
+        np.fill_diagonal(weight, 0.0)
+        acc = self.engine.gravitConstant * np.einsum("ij,ijk->ik", weight, vecToOthers)
+
+        vel = vel + acc * self.stepSize
+        pos = pos + vel * self.stepSize
+        return pos, vel
+
+    def recompute(self) -> None:
+        # restarts the prediction from the live state, fill() predicts ahead from there
+        self.currentPos = self.engine.pos[self.indices].copy()
+        self.currentVel = self.engine.vel[self.indices].copy()
+        self.mass = self.engine.mass[self.indices].copy()
+        if self.buffer is None or self.buffer.shape[1] != len(self.indices):
+            self.buffer = np.empty((self.steps, len(self.indices), 2), dtype=np.float32)
+            self.velBuffer = np.empty((self.steps, len(self.indices), 2), dtype=np.float32)
+
+        self.tailPos, self.tailVel = self.currentPos, self.currentVel
+        self.head = 0
+        self.numPredicted = 0
+        self.elapsed = 0.0
+        self.stepsSinceSyncCheck = 0
+        self.engineVersion = self.engine.version
+        self.isValid = True
+        self.fill()
+
+    def fill(self) -> None:
+        # predicts further ahead until the buffer is full or maxFillTime is used up, so a recompute is spread over
+        # several frames instead of freezing one
+        start = time.perf_counter()
+        while self.numPredicted < self.steps and time.perf_counter() - start < self.maxFillTime:
+            self.tailPos, self.tailVel = self.predictStep(self.tailPos, self.tailVel)
+            step = (self.head + self.numPredicted) % self.steps
+            self.buffer[step] = self.tailPos
+            self.velBuffer[step] = self.tailVel
+            self.numPredicted += 1
+
+    def update(self, indices: list) -> None:
+        # a full recompute only happens when the tracked system changed
+        indices = np.asarray(indices, dtype=np.int64)
+        if not np.array_equal(indices, self.indices):
+            self.indices = indices
+            self.slots = {int(index): slot for slot, index in enumerate(indices)}
+            self.invalidate()
+        # only changes to the tracked bodies matter, and only if they move the bodies off the prediction
+        if self.isValid and len(indices) and np.max(self.engine.versions[indices]) > self.engineVersion:
+            if self.isInSync():
+                self.engineVersion = self.engine.version
+            else:
+                self.invalidate()
+        if self.isValid and self.stepsSinceSyncCheck >= self.syncInterval:
+            self.stepsSinceSyncCheck = 0
+            if not self.isInSync():
+                self.invalidate()
+        if not self.isValid:
+            self.recompute()
+        else:
+            self.fill()
+
+    def isInSync(self) -> bool:
+        pos = self.engine.pos[self.indices]
+        vel = self.engine.vel[self.indices]
+        mass = self.engine.mass[self.indices]
+        speedScale = np.maximum(np.hypot(self.currentVel[:, 0], self.currentVel[:, 1]), 1e-9)
+
+        return (np.all(np.abs(pos - self.currentPos) <= self.positionTolerance)
+                and np.all(np.hypot(*(vel - self.currentVel).T) <= self.relativeTolerance * speedScale)
+                and np.all(np.abs(mass - self.mass) <= self.relativeTolerance * self.mass))
+
+    def advance(self, dt: float) -> None:
+        # drop the steps that are now in the past, the next fill() predicts the same amount further ahead
+        if not self.isValid:
+            return
+
+        self.elapsed += dt
+        while self.elapsed >= self.stepSize:
+            self.elapsed -= self.stepSize
+            if self.numPredicted == 0:
+                # nothing predicted yet, the present is stepped on its own
+                self.tailPos, self.tailVel = self.predictStep(self.tailPos, self.tailVel)
+                self.currentPos, self.currentVel = self.tailPos, self.tailVel
+            else:
+                # the oldest predicted step is now the present
+                self.currentPos = self.buffer[self.head].astype(float)
+                self.currentVel = self.velBuffer[self.head].astype(float)
+                self.head = (self.head + 1) % self.steps
+                self.numPredicted -= 1
+            self.stepsSinceSyncCheck += 1
+
+    def getPath(self, bodyIndex: int) -> np.ndarray:
+        slot = self.slots[bodyIndex]
+        end = self.head + self.numPredicted
+        if end <= self.steps:
+            return self.buffer[self.head:end, slot]
+        return np.concatenate((self.buffer[self.head:, slot], self.buffer[:end - self.steps, slot]))
@@ -0,0 +1,231 @@
+import sys
+import time
+import numpy as np
+
+
+def spreadBits(values: np.ndarray) -> np.ndarray:
+    # inserts a zero bit between every bit of a 32-bit integer (Morton / Z-order encoding)
+    values = values.astype(np.int64) & 0xFFFFFFFF
+    values = (values | (values << 16)) & 0x0000FFFF0000FFFF
+    values = (values | (values << 8)) & 0x00FF00FF00FF00FF
+    values = (values | (values << 4)) & 0x0F0F0F0F0F0F0F0F
+    values = (values | (values << 2)) & 0x3333333333333333
+    values = (values | (values << 1)) & 0x5555555555555555
+    return values
+
+
+class QuadTree:
+    # flat-array quadtree, nodes are stored level by level so the children of a node are contiguous
+    def __init__(self, pos: np.ndarray, mass: np.ndarray, leafSize: int = 8, maxDepth: int = 20) -> None:
+        self.pos = pos
+        self.mass = mass
+        self.leafSize = leafSize
+        self.maxDepth = maxDepth
+        self.build()
+
+    def build(self) -> None:
+        pos, mass, maxDepth = self.pos, self.mass, self.maxDepth
+
+        # bounding square of every body
+        lower = pos.min(axis=0)
+        rootSize = max(float(np.max(pos.max(axis=0) - lower)), 1e-9) * (1 + 1e-9)
+        cellsPerSide = 1 << maxDepth
+        cellCoords = np.clip(((pos - lower) / rootSize * cellsPerSide).astype(np.int64), 0, cellsPerSide - 1)
+        keys = spreadBits(cellCoords[:, 0]) | (spreadBits(cellCoords[:, 1]) << 1)
+
+        # bodies sorted along the Z-order curve, every node owns a contiguous slice of them
+        self.order = np.argsort(keys, kind="stable")
+        self.rank = np.empty(len(pos), dtype=np.int64)
+        self.rank[self.order] = np.arange(len(pos))
+        sortedKeys = keys[self.order]
+        sortedMass = mass[self.order]
+        sortedWeightedPos = pos[self.order] * sortedMass[:, None]
+
+        levelStarts, levelCounts, levelSizes, levelLeaves = [], [], [], []
+        levelChildStarts, levelChildCounts = [], []
+
+        # level 0 is the root
+        starts = np.array([0], dtype=np.int64)
+        counts = np.array([len(pos)], dtype=np.int64)
+        prefixes = np.array([0], dtype=np.int64)
+        nodeOffset = 0
+
+        for level in range(maxDepth + 1):
+            isLeaf = (counts <= self.leafSize) | (level == maxDepth)
+            levelStarts.append(starts)
+            levelCounts.append(counts)
+            levelSizes.append(np.full(len(starts), rootSize / (1 << level)))
+            levelLeaves.append(isLeaf)
+
+            childStarts = np.zeros(len(starts), dtype=np.int64)
+            childCounts = np.zeros(len(starts), dtype=np.int64)
+            levelChildStarts.append(childStarts)
+            levelChildCounts.append(childCounts)
+            nodeOffset += len(starts)
+
+            if np.all(isLeaf):
+                break
+
+            # bodies that belong to internal nodes are split into up to four children
+            internalStarts, internalCounts = starts[~isLeaf], counts[~isLeaf]
+            firstRank = np.repeat(internalStarts, internalCounts)
+            ranks = firstRank + np.arange(len(firstRank)) - np.repeat(np.cumsum(internalCounts) - internalCounts, internalCounts)
+            childPrefixes = sortedKeys[ranks] >> (2 * (maxDepth - level - 1))
+            newNode = np.empty(len(ranks), dtype=bool)
+            newNode[0] = True
+            newNode[1:] = childPrefixes[1:] != childPrefixes[:-1]
+            boundaries = np.flatnonzero(newNode)
+
+            nextPrefixes = childPrefixes[boundaries]
+            nextStarts = ranks[boundaries]
+            nextCounts = np.diff(np.append(boundaries, len(ranks)))
+
+            # children of a parent are contiguous, find them through the parent prefix
+            parentPrefixes = nextPrefixes >> 2
+            internalPrefixes = prefixes[~isLeaf]
+            firstChild = np.searchsorted(parentPrefixes, internalPrefixes, side="left")
+            lastChild = np.searchsorted(parentPrefixes, internalPrefixes, side="right")
+            childStarts[~isLeaf] = nodeOffset + firstChild
+            childCounts[~isLeaf] = lastChild - firstChild
+
+            starts, counts, prefixes = nextStarts, nextCounts, nextPrefixes
+
+        self.nodeStart = np.concatenate(levelStarts)
+        self.nodeCount = np.concatenate(levelCounts)
+        self.nodeSize = np.concatenate(levelSizes)
+        self.isLeaf = np.concatenate(levelLeaves)
+        self.childStart = np.concatenate(levelChildStarts)
+        self.childCount = np.concatenate(levelChildCounts)
+
+        # monopole of every node from prefix sums over the sorted bodies
+        cumMass = np.concatenate(([0.0], np.cumsum(sortedMass)))
+        cumWeightedPos = np.vstack(([0.0, 0.0], np.cumsum(sortedWeightedPos, axis=0)))
+        nodeEnd = self.nodeStart + self.nodeCount
+        self.nodeMass = cumMass[nodeEnd] - cumMass[self.nodeStart]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.nodeCom = (cumWeightedPos[nodeEnd] - cumWeightedPos[self.nodeStart]) / self.nodeMass[:, None]
+        self.nodeCom[self.nodeMass <= 0] = pos[self.order[self.nodeStart[self.nodeMass <= 0]]]
+
+    def calcAccelerations(self, gravitConstant: float, softeningParameter: float, openingAngle: float = 0.5, chunkSize: int = 4096) -> np.ndarray:
+        pos, mass = self.pos, self.mass
+        acc = np.zeros_like(pos)
+        softeningSquared = softeningParameter**2
+        openingAngleSquared = openingAngle**2
+
+        for chunkStart in range(0, len(pos), chunkSize):
+            chunkStop = min(chunkStart + chunkSize, len(pos))
+            chunkLength = chunkStop - chunkStart
+            accX = np.zeros(chunkLength)
+            accY = np.zeros(chunkLength)
+
+            # frontier of (body, node) pairs still to be resolved, every body starts at the root
+            bodies = np.arange(chunkStart, chunkStop)
+            nodes = np.zeros(chunkLength, dtype=np.int64)
+
+            while len(bodies):
+                bodyPos = pos[bodies]
+                dx = self.nodeCom[nodes, 0] - bodyPos[:, 0]
+                dy = self.nodeCom[nodes, 1] - bodyPos[:, 1]
+                distSquared = dx * dx + dy * dy
+                isFar = self.nodeSize[nodes]**2 < openingAngleSquared * distSquared
+
+                # far nodes act as a single mass at their centre of mass
+                farBodies, farNodes = bodies[isFar], nodes[isFar]
+                nodeMass = self.nodeMass[farNodes]
+                nodeCom = self.nodeCom[farNodes]
+                # take the body itself out of a node that contains it
+                containsBody = (self.rank[farBodies] >= self.nodeStart[farNodes]) & (self.rank[farBodies] < self.nodeStart[farNodes] + self.nodeCount[farNodes])
+                if np.any(containsBody):
+                    ownMass = mass[farBodies[containsBody]]
+                    remainingMass = nodeMass[containsBody] - ownMass
+                    with np.errstate(invalid="ignore", divide="ignore"):
+                        nodeCom[containsBody] = (nodeCom[containsBody] * nodeMass[containsBody, None] - pos[farBodies[containsBody]] * ownMass[:, None]) / remainingMass[:, None]
+                    nodeMass[containsBody] = np.where(remainingMass > 0, remainingMass, 0.0)
+                    nodeCom[containsBody & (nodeMass <= 0)] = pos[farBodies[containsBody & (nodeMass <= 0)]]
+                self.accumulate(accX, accY, farBodies - chunkStart, pos[farBodies], nodeCom, nodeMass, softeningSquared)
+
+                # near leaves are summed body by body
+                isNearLeaf = ~isFar & self.isLeaf[nodes]
+                leafBodies, leafNodes = bodies[isNearLeaf], nodes[isNearLeaf]
+                memberCounts = self.nodeCount[leafNodes]
+                memberBodies = np.repeat(leafBodies, memberCounts)
+                memberOffsets = np.arange(len(memberBodies)) - np.repeat(np.cumsum(memberCounts) - memberCounts, memberCounts)
+                members = self.order[np.repeat(self.nodeStart[leafNodes], memberCounts) + memberOffsets]
+                notSelf = members != memberBodies
+                memberBodies, members = memberBodies[notSelf], members[notSelf]
+                self.accumulate(accX, accY, memberBodies - chunkStart, pos[memberBodies], pos[members], mass[members], softeningSquared)
+
+                # near internal nodes are opened into their children
+                isOpened = ~isFar & ~self.isLeaf[nodes]
+                openBodies, openNodes = bodies[isOpened], nodes[isOpened]
+                childCounts = self.childCount[openNodes]
+                bodies = np.repeat(openBodies, childCounts)
+                childOffsets = np.arange(len(bodies)) - np.repeat(np.cumsum(childCounts) - childCounts, childCounts)
+                nodes = np.repeat(self.childStart[openNodes], childCounts) + childOffsets
+
+            acc[chunkStart:chunkStop, 0] = accX
+            acc[chunkStart:chunkStop, 1] = accY
+
+        return gravitConstant * acc
+
+    @staticmethod
+    def accumulate(accX: np.ndarray, accY: np.ndarray, localBodies: np.ndarray, bodyPos: np.ndarray, sourcePos: np.ndarray, sourceMass: np.ndarray, softeningSquared: float) -> None:
+        if len(localBodies) == 0:
+            return
+
+        dx = sourcePos[:, 0] - bodyPos[:, 0]
+        dy = sourcePos[:, 1] - bodyPos[:, 1]
+        distSquared = dx * dx + dy * dy + softeningSquared
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weight = np.where(distSquared > 0, sourceMass / (distSquared * np.sqrt(distSquared)), 0.0)
+        accX += np.bincount(localBodies, weights=weight * dx, minlength=len(accX))
+        accY += np.bincount(localBodies, weights=weight * dy, minlength=len(accY))
+
+
+def calcBarnesHutAccelerations(pos: np.ndarray, mass: np.ndarray, gravitConstant: float, softeningParameter: float, openingAngle: float = 0.5) -> np.ndarray:
+    # the tree is rebuilt from the flat arrays on every call
+    return QuadTree(pos, mass).calcAccelerations(gravitConstant, softeningParameter, openingAngle)
+
+
+def createTestDisk(numBodies: int, seed: int = 0) -> tuple:
+    # central mass plus an exponential disk of light bodies
+    rng = np.random.default_rng(seed)
+    radii = rng.exponential(150, numBodies) + 20
+    angles = rng.uniform(0, 2 * np.pi, numBodies)
+    pos = np.column_stack((640 + radii * np.cos(angles), 360 + radii * np.sin(angles)))
+    mass = rng.uniform(0.5, 2.0, numBodies)
+    pos[0], mass[0] = (640, 360), 10000
+
+    return pos, mass
+
+
+def compareSolvers(bodyCounts: list, openingAngles: list, gravitConstant: float = 2.0, softeningParameter: float = 1.0, sampleSize: int = 1000) -> None:
+    # accuracy and speed of Barnes-Hut against direct summation, direct is sampled for large N
+    from engine import calcDirectAccelerations
+
+    print(f"{'N':>8} {'solver':>12} {'time (s)':>10} {'median err':>11} {'p99 err':>10}")
+
+    for numBodies in bodyCounts:
+        pos, mass = createTestDisk(numBodies)
+        sample = np.random.default_rng(1).choice(numBodies, min(sampleSize, numBodies), replace=False)
+
+        # direct reference on the sampled rows, time scaled up to all rows
+        start = time.perf_counter()
+        reference = calcDirectAccelerations(pos, mass, gravitConstant, softeningParameter, chunkSize=128, targets=sample)
+        directTime = (time.perf_counter() - start) * numBodies / len(sample)
+        print(f"{numBodies:>8} {'direct':>12} {directTime:>10.3f} {'-':>11} {'-':>10}")
+
+        for openingAngle in openingAngles:
+            start = time.perf_counter()
+            acc = calcBarnesHutAccelerations(pos, mass, gravitConstant, softeningParameter, openingAngle)
+            treeTime = time.perf_counter() - start
+            relativeError = np.linalg.norm(acc[sample] - reference, axis=1) / np.linalg.norm(reference, axis=1)
+            print(f"{numBodies:>8} {f'theta={openingAngle}':>12} {treeTime:>10.3f} {np.median(relativeError):>11.2e} {np.percentile(relativeError, 99):>10.2e}")
+
+
+if __name__ == "__main__":
+    # usage: python quadtree.py [N ...]
+    # the comparison imports engine, which needs the shared modules in the repository root
+    import rootPath
+    bodyCounts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    compareSolvers(bodyCounts, openingAngles=[0.3, 0.5, 0.7, 1.0])
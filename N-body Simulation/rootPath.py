@@ -0,0 +1,8 @@
+import os
+import sys
+
+# the N-body scripts share modules (integrators, timestep, polyline) with the other simulations in the repository root.
+# entry scripts import this before anything else, library modules expect the path to be set up already
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
@@ -0,0 +1,72 @@
+import numpy as np
+from engine import NBodyEngine
+from collisions import findOverlappingPairs
+
+# procedural disks of many small bodies, sampled and added to the engine in bulk without Planet objects
+
+class DiskSpec:
+    # distribution of a protoplanetary disk around a central body
+    def __init__(self, numBodies: int = 10000, innerRadius: float = 60.0, outerRadius: float = 340.0, densityExponent: float = 1.0,
+                 minMass: float = 0.01, maxMass: float = 1.0, massExponent: float = 1.8, eccentricityScale: float = 0.02,
+                 bodyDensity: float = 0.5, minRadius: float = 0.5) -> None:
+        self.numBodies = numBodies
+        self.innerRadius = innerRadius
+        self.outerRadius = outerRadius
+        # surface density falls off as r^-densityExponent
+        self.densityExponent = densityExponent
+        # mass spectrum dN/dm ~ m^-massExponent, most bodies are small
+        self.minMass = minMass
+        self.maxMass = maxMass
+        self.massExponent = massExponent
+        # eccentricities are Rayleigh distributed, as for a dynamically cool disk
+        self.eccentricityScale = eccentricityScale
+        # radius follows from mass like for the planets (mass / radius^3)
+        self.bodyDensity = bodyDensity
+        self.minRadius = minRadius
+
+
+def samplePowerLaw(rng: np.random.Generator, low: float, high: float, exponent: float, size: int) -> np.ndarray:
+    # inverse transform sampling of p(x) ~ x^exponent on [low, high]
+    u = rng.random(size)
+    q = exponent + 1
+    if abs(q) < 1e-12:
+        return low * (high / low)**u
+    return (low**q + u * (high**q - low**q))**(1 / q)
+
+
+def sampleDiskPositions(spec: DiskSpec, rng: np.random.Generator, size: int) -> np.ndarray:
+    # a surface density r^-p means p(r) ~ r^(1-p) over the annulus
+    dist = samplePowerLaw(rng, spec.innerRadius, spec.outerRadius, 1 - spec.densityExponent, size)
+    angle = rng.uniform(0, 2 * np.pi, size)
+    return dist[:, None] * np.stack((np.cos(angle), np.sin(angle)), axis=1)
+
+
+def sampleDisk(spec: DiskSpec, rng: np.random.Generator, maxResamplePasses: int = 8) -> tuple:
+    # positions relative to the central body, masses, radii and the orbital elements for the velocities
+    offsets = sampleDiskPositions(spec, rng, spec.numBodies)
+    mass = samplePowerLaw(rng, spec.minMass, spec.maxMass, -spec.massExponent, spec.numBodies)
+    radius = np.maximum(np.cbrt(mass / spec.bodyDensity), spec.minRadius)
+
+    # bodies that would start inside each other are placed again, otherwise the first step is one big merger
+    for _ in range(maxResamplePasses):
+        _, overlapping = findOverlappingPairs(offsets, radius)
+        if len(overlapping) == 0:
+            break
+        overlapping = np.unique(overlapping)
+        offsets[overlapping] = sampleDiskPositions(spec, rng, len(overlapping))
+
+    eccentricity = np.minimum(rng.rayleigh(spec.eccentricityScale, spec.numBodies), 0.9)
+    trueAnomaly = rng.uniform(0, 2 * np.pi, spec.numBodies)
+
+    return offsets, mass, radius, eccentricity, trueAnomaly
+
+
+def spawnDisk(engine: NBodyEngine, centralIndex: int, spec: DiskSpec, rng: np.random.Generator = None) -> np.ndarray:
+    # returns the engine indices of the new bodies
+    rng = np.random.default_rng() if rng is None else rng
+    offsets, mass, radius, eccentricity, trueAnomaly = sampleDisk(spec, rng)
+
+    indices = engine.addBodies(engine.pos[centralIndex] + offsets, mass, radius=radius)
+    engine.setOrbitalVelocities(indices, centralIndex, eccentricity, trueAnomaly)
+
+    return indices
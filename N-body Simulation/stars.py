@@ -1,36 +1,78 @@
-from pygame_particles import Particle, ParticleContainer, Circle
-import random
+import numpy as np
 import pygame
 
 class Star():
-    def __init__(self):
-        super().__init__()
-        self.container = ParticleContainer()
-        self.spawnDelay = 1
+    # fixed-capacity star pool stored in numpy arrays, drawn with one batched blit of pre-rendered sprites
+    def __init__(self, capacity: int = 4096, starsPerSpawn: int = 1, spawnDelay: float = 1, lifeSeconds: float = 2, fadeSeconds: float = 3,
+                 sizeRange: tuple = (1, 5), speedRange: tuple = (60, 300), color = "white", alphaLevels: int = 16):
+        self.capacity = capacity
+        self.starsPerSpawn = starsPerSpawn
+        self.spawnDelay = spawnDelay
         self.time = 0
-        
+        # stars shine for lifeSeconds and then fade out over fadeSeconds
+        self.lifeSeconds = lifeSeconds
+        self.fadeSeconds = fadeSeconds
+        self.sizeRange = sizeRange
+        # pixels per second
+        self.speedRange = speedRange
+        self.rng = np.random.default_rng()
+
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.age = np.zeros(capacity)
+        self.size = np.zeros(capacity, dtype=np.int64)
+        self.alpha = np.zeros(capacity)
+        self.isAlive = np.zeros(capacity, dtype=bool)
+
+        # one sprite per size and alpha level, so drawing never creates surfaces
+        self.alphaLevels = alphaLevels
+        self.sprites = [self.createSprite(size, color, 255 * (level + 1) // alphaLevels)
+                        for size in range(sizeRange[1] + 1) for level in range(alphaLevels)]
+
+    @staticmethod
+    def createSprite(radius: int, color, alpha: int) -> pygame.Surface:
+        sprite = pygame.Surface((2 * radius + 1, 2 * radius + 1), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, pygame.Color(color), (radius, radius), max(radius, 1))
+        sprite.set_alpha(alpha)
+        return sprite
+
+    def spawn(self, count: int, screenWidth: int, screenHeight: int) -> None:
+        # reuses dead slots, when the pool is full new stars are dropped
+        slots = np.flatnonzero(~self.isAlive)[:count]
+        angle = self.rng.uniform(0, 2 * np.pi, len(slots))
+        speed = self.rng.uniform(*self.speedRange, len(slots))
+
+        self.pos[slots, 0] = self.rng.integers(0, screenWidth, len(slots), endpoint=True)
+        self.pos[slots, 1] = self.rng.integers(0, screenHeight, len(slots), endpoint=True)
+        self.vel[slots] = speed[:, None] * np.stack((np.cos(angle), np.sin(angle)), axis=1)
+        self.age[slots] = 0
+        self.size[slots] = self.rng.integers(self.sizeRange[0], self.sizeRange[1], len(slots), endpoint=True)
+        self.alpha[slots] = 1
+        self.isAlive[slots] = True
+
+    def update(self, dt: float) -> None:
+        alive = self.isAlive
+        self.age[alive] += dt
+        self.pos[alive] += self.vel[alive] * dt
+        self.alpha[alive] = np.clip(1 - (self.age[alive] - self.lifeSeconds) / self.fadeSeconds, 0, 1)
+        self.isAlive &= self.age < self.lifeSeconds + self.fadeSeconds
+
+    def draw(self, screen: pygame.Surface) -> None:
+        alive = np.flatnonzero(self.isAlive)
+        if len(alive) == 0:
+            return
+
+        alphaLevel = np.clip(np.ceil(self.alpha[alive] * self.alphaLevels).astype(np.int64) - 1, 0, self.alphaLevels - 1)
+        spriteIndex = self.size[alive] * self.alphaLevels + alphaLevel
+        topLeft = (self.pos[alive] - self.size[alive, None]).astype(np.int64)
+        screen.blits([(self.sprites[index], position) for index, position in zip(spriteIndex.tolist(), topLeft.tolist())], doreturn=False)
+
     def createStars(self, dt, screen: pygame.Surface, screenWidth = 1280, screenHeight = 720):
         self.time += dt
-        
+
         if self.time >= self.spawnDelay:
             self.time = 0
-            particle = Particle(
-                center_x=random.randint(0, screenWidth),
-                center_y=random.randint(0, screenHeight),
-                objects_count=1,
-                life_seconds=2,
-                fade_seconds=3,
-                color="white",
-                size=(1, 5),
-                speed=(1, 5),
-                width=0,
-                shape_cls=Circle,
-            )
-        
-            self.container.add(particle)
-        self.container.draw(screen)
-
-    
-
-        
-        
+            self.spawn(self.starsPerSpawn, screenWidth, screenHeight)
+
+        self.update(dt)
+        self.draw(screen)
@@ -1,23 +1,10 @@
 import pygame
-from utils import Utils
+from body import Body
 
-class Sun:
-    def __init__(self, x: int, y: int, mass: int, color: tuple, radius: int):
-        self.x = x
-        self.y = y
-        self.mass = mass
-        self.pos = pygame.Vector2(self.x, self.y)
-        self.color = color
-        self.radius = radius
-        
-    def drawSun(self, screen):
-        pygame.draw.circle(screen, self.color, self.pos, self.radius)
-    
-    def isMouseOnSun(self):
-        sunRect = Utils.createRect(self.x, self.y, self.radius)
-        mousePosX, mousePosY = Utils.getMousePos()
-        mouseRect = Utils.createMouseRect(mousePosX, mousePosY, 25)
-        
-        return pygame.Rect.colliderect(mouseRect, sunRect)
-    
-    
\ No newline at end of file
+class Sun(Body):
+    def __init__(self, engine, x: int, y: int, mass: int, color: tuple, radius: int):
+        super().__init__(engine, x, y, mass, pygame.Vector2(0, 0), color, radius)
+
+    def drawSun(self, screen, renderPos=None):
+        # renderPos lets the caller draw an interpolated position
+        pygame.draw.circle(screen, self.color, self.pos if renderPos is None else tuple(renderPos), self.radius)
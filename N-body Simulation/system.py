@@ -0,0 +1,36 @@
+from engine import NBodyEngine
+
+# shared by the pygame window (main.py) and the headless runner (headless.py), so no pygame here
+WIDTH, HEIGHT = 1280, 720
+GRAVITATIONAL_CONSTANT = 2.0 # 0.5 to 2 is good
+SOFTENING_PARAMETER = 1.0 # prevents extreme accelerations at close approach
+GRAVITY_SOLVER = "auto" # "direct", "barnes-hut" for large N or "auto" to switch by body count
+OPENING_ANGLE = 0.5 # Barnes-Hut accuracy, smaller is more accurate (see quadtree.py report)
+INTEGRATOR = "yoshida4" # "rk4", "leapfrog", "yoshida4" or "dopri45"
+
+SUN = {"x": WIDTH / 2, "y": HEIGHT / 2, "mass": 10000, "color": (255, 255, 0), "radius": 30}
+PLANETS = {
+    "earth": {"x": 790, "y": 360, "mass": 10, "color": (0, 102, 255), "radius": 6},
+    "jupiter": {"x": 940, "y": 360, "mass": 300, "color": (255, 165, 0), "radius": 14},
+    "saturn": {"x": 1090, "y": 360, "mass": 200, "color": (210, 180, 140), "radius": 12},
+}
+# protoplanetary disk around the sun, see spawner.DiskSpec for every parameter
+DISK = {"innerRadius": 60, "outerRadius": 340, "densityExponent": 1.0, "minMass": 0.01, "maxMass": 1.0, "massExponent": 1.8, "eccentricityScale": 0.02}
+
+
+def createEngine(gravitySolver: str = GRAVITY_SOLVER, openingAngle: float = OPENING_ANGLE, integrator: str = INTEGRATOR) -> NBodyEngine:
+    return NBodyEngine(GRAVITATIONAL_CONSTANT, SOFTENING_PARAMETER, gravitySolver=gravitySolver, openingAngle=openingAngle, integrator=integrator)
+
+
+def createSolarSystem(engine: NBodyEngine) -> tuple:
+    # same bodies as the window, added straight to the engine without views
+    sunIndex = engine.addBody(SUN["x"], SUN["y"], SUN["mass"], radius=SUN["radius"])
+    planetIndices = [engine.addBody(planet["x"], planet["y"], planet["mass"], radius=planet["radius"]) for planet in PLANETS.values()]
+
+    return sunIndex, planetIndices
+
+
+def setInitialVelocities(engine: NBodyEngine, sunIndex: int, planetIndices: list) -> None:
+    for index in planetIndices:
+        engine.setCircularVelocity(index, sunIndex)
+    engine.removeNetMomentum()
@@ -0,0 +1,131 @@
+import os
+import time
+import pygame
+
+# images and sounds shared by the simulations: loaded on first use from paths relative to the project folder and
+# cached, scaled images are cached per size. a missing file or audio device gives a placeholder instead of a crash,
+# and every sound plays through a rate limiter on a small pool of mixer channels so bursts of events do not pile up
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+MISSING_IMAGE_COLOR = "#FF00FF"
+
+
+class LimitedSound:
+    # a sound that plays at most maxPerSecond times a second and on at most maxChannels channels at once,
+    # plays over the limit are dropped. without a sound (missing file or no mixer) nothing plays
+    def __init__(self, sound: pygame.mixer.Sound, manager: "AssetManager", maxPerSecond: float, maxChannels: int) -> None:
+        self.sound = sound
+        self.manager = manager
+        self.minInterval = 1 / maxPerSecond
+        self.maxChannels = maxChannels
+        self.lastPlayTime = -float("inf")
+        self.channels = []
+
+    def play(self) -> bool:
+        if self.sound is None:
+            return False
+        now = time.perf_counter()
+        if now - self.lastPlayTime < self.minInterval:
+            return False
+        # channels still playing this sound
+        self.channels = [channel for channel in self.channels if channel.get_busy() and channel.get_sound() == self.sound]
+        if len(self.channels) >= self.maxChannels:
+            return False
+        channel = self.manager.findFreeChannel()
+        if channel is None:
+            return False
+        channel.play(self.sound)
+        self.channels.append(channel)
+        self.lastPlayTime = now
+        return True
+
+
+class AssetManager:
+    def __init__(self, root: str = PROJECT_DIR, numChannels: int = 8) -> None:
+        self.root = root
+        self.numChannels = numChannels
+        # (path, size) -> surface, size None is the image as loaded
+        self.images = {}
+        # path -> decoded sound, (path, maxPerSecond, maxChannels) -> limited sound playing it
+        self.soundData = {}
+        self.sounds = {}
+        self.channelPool = None
+        self.reportedPaths = set()
+
+    def resolvePath(self, path: str) -> str:
+        return path if os.path.isabs(path) else os.path.join(self.root, path)
+
+    def reportMissing(self, path: str, error: Exception) -> None:
+        # every missing asset is reported once
+        if path not in self.reportedPaths:
+            self.reportedPaths.add(path)
+            print(f"asset {path} is missing ({error}), continuing without it")
+
+    def getImage(self, path: str, size: tuple = None) -> pygame.Surface:
+        key = (path, tuple(size) if size is not None else None)
+        if key in self.images:
+            return self.images[key]
+
+        if size is not None:
+            image = pygame.transform.smoothscale(self.getImage(path), key[1])
+        else:
+            try:
+                image = pygame.image.load(self.resolvePath(path))
+                # converted to the display format once, if there is a display yet
+                if pygame.display.get_surface() is not None:
+                    image = image.convert_alpha()
+            except (FileNotFoundError, pygame.error) as error:
+                self.reportMissing(path, error)
+                image = self.createPlaceholder()
+        self.images[key] = image
+        return image
+
+    def createPlaceholder(self) -> pygame.Surface:
+        # a crossed out square, visible but not in the way
+        image = pygame.Surface((32, 32), pygame.SRCALPHA)
+        pygame.draw.rect(image, MISSING_IMAGE_COLOR, image.get_rect(), width=2)
+        pygame.draw.line(image, MISSING_IMAGE_COLOR, (0, 0), (31, 31), width=2)
+        pygame.draw.line(image, MISSING_IMAGE_COLOR, (0, 31), (31, 0), width=2)
+        return image
+
+    def initMixer(self) -> bool:
+        if self.channelPool is not None:
+            return True
+        try:
+            if not pygame.mixer.get_init():
+                pygame.mixer.init()
+        except pygame.error as error:
+            self.reportMissing("audio device", error)
+            return False
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), self.numChannels))
+        self.channelPool = [pygame.mixer.Channel(index) for index in range(self.numChannels)]
+        return True
+
+    def findFreeChannel(self) -> pygame.mixer.Channel:
+        for channel in self.channelPool:
+            if not channel.get_busy():
+                return channel
+        return None
+
+    def loadSound(self, path: str) -> pygame.mixer.Sound:
+        # decoded once per path, None without the file or a mixer
+        if path not in self.soundData:
+            sound = None
+            if self.initMixer():
+                try:
+                    sound = pygame.mixer.Sound(self.resolvePath(path))
+                except (FileNotFoundError, pygame.error) as error:
+                    self.reportMissing(path, error)
+            self.soundData[path] = sound
+        return self.soundData[path]
+
+    def getSound(self, path: str, maxPerSecond: float = 10, maxChannels: int = 2) -> LimitedSound:
+        # the limits are part of the key, so asking for the same file with other limits does not return the first limiter
+        key = (path, maxPerSecond, maxChannels)
+        if key not in self.sounds:
+            self.sounds[key] = LimitedSound(self.loadSound(path), self, maxPerSecond, maxChannels)
+        return self.sounds[key]
+
+
+# shared by all simulations
+assets = AssetManager()
@@ -1,10 +1,10 @@
 from vpython import *
 import numpy as np
 import random
-import pygame 
+from assetManager import assets
 
-pygame.mixer.init()
-flashSound = pygame.mixer.Sound("Sound/flash sound.mp3")
+# many particles can cross the horizon at once, the sound is rate limited
+flashSound = assets.getSound("Sound/flash sound.mp3", maxPerSecond=8, maxChannels=3)
 
 canvas(width=1200, height=800)
 
@@ -1,32 +1,92 @@
+import argparse
+import time
 import numpy as np
 import pygame
-import random
 from pygame_widgets.slider import Slider
 from pygame_widgets.textbox import TextBox
 import pygame_widgets
 from pygame_widgets import update
 from pygame_widgets.button import Button
+from timestep import FixedTimestep
+from flockEngine import FlockEngine, ParallelFlockEngine
+from obstacleField import SignedDistanceField
 
 GAME_WIDTH, GAME_HEIGHT = 1280, 720
+NEIGHBOR_RADIUS = 50
+BOID_COLOR = "#558cf4"
+BOUNCED_COLOR = "#F23B1B"
+OBSTACLE_COLOR = (64, 70, 82)
+# obstacles when no --obstacles file is given, polygons in pixels
+OBSTACLE_POLYGONS = (((300, 180), (440, 180), (440, 320), (300, 320)),
+                     ((840, 140), (980, 380), (700, 380)),
+                     ((520, 470), (760, 470), (760, 510), (520, 510)))
+# triangle pointing up, scaled by the size slider
+BASE_TRIANGLE = ((0, -2.5), (-1.5, 1.5), (1.5, 1.5))
+
+class BoidSpriteAtlas:
+    # every boid triangle pre-rendered per heading and color, the whole flock is drawn with one Surface.blits call
+    def __init__(self, numHeadings: int = 64, numTints: int = 8) -> None:
+        self.numHeadings = numHeadings
+        # colors between the normal and the bounced color used by the bounce transition
+        self.numTints = numTints
+        self.sprites = []
+        self.spriteCenter = 0.0
+        self.key = None
+
+    def build(self, vertexOffset: float, normalColor, bouncedColor) -> None:
+        # only rebuilds when the size or the palette changed
+        key = (vertexOffset, str(normalColor), str(bouncedColor))
+        if key == self.key:
+            return
+        self.key = key
+
+        spriteSize = int(np.ceil(2 * 2.5 * vertexOffset)) + 3
+        self.spriteCenter = spriteSize / 2
+        self.sprites = []
+        for tint in range(self.numTints):
+            color = pygame.Color(normalColor).lerp(pygame.Color(bouncedColor), tint / (self.numTints - 1))
+            for heading in range(self.numHeadings):
+                headingAngle = 2 * np.pi * heading / self.numHeadings
+                angle = pygame.Vector2(np.cos(headingAngle), np.sin(headingAngle)).angle_to(pygame.Vector2(0, -1))
+                points = [(pygame.Vector2(vertex) * vertexOffset).rotate(-angle) + (self.spriteCenter, self.spriteCenter) for vertex in BASE_TRIANGLE]
+                sprite = pygame.Surface((spriteSize, spriteSize), pygame.SRCALPHA)
+                pygame.draw.polygon(sprite, color, points)
+                # in the display's pixel format blitting is a plain copy instead of a conversion
+                self.sprites.append(sprite.convert_alpha() if pygame.display.get_surface() is not None else sprite)
+
+    def draw(self, screen: pygame.Surface, pos: np.ndarray, vel: np.ndarray, tints: np.ndarray) -> None:
+        # a boid standing still points up, like before
+        heading = np.where(np.any(vel != 0, axis=1), np.arctan2(vel[:, 1], vel[:, 0]), -np.pi / 2)
+        headingBin = np.round(heading / (2 * np.pi) * self.numHeadings).astype(np.int64) % self.numHeadings
+        tintBin = np.round(tints * (self.numTints - 1)).astype(np.int64)
+        spriteIndex = tintBin * self.numHeadings + headingBin
+        topLeft = np.rint(pos - self.spriteCenter).astype(np.int64)
+
+        screen.blits([(self.sprites[index], position) for index, position in zip(spriteIndex.tolist(), topLeft.tolist())], doreturn=False)
 
 class Boid:
-    def __init__(self) -> None:
-        self.pos = pygame.Vector2(random.randint(0, GAME_WIDTH), random.randint(0, GAME_HEIGHT))
-        self.vel =  pygame.Vector2(random.uniform(-100, 100), random.uniform(-100, 100))
-        self.normalColor = pygame.Color("#558cf4")
-        self.color = self.normalColor
-        self.maxSpeed = 200
-        self.vertexOffset = 4
-        self.minDistanceToNeighbor = 50
-        self.separationWeight = 0.5
-        self.alignmentWeight = 0.5
-        self.cohesionWeight = 0.5
-        self.hasBounced = False
+    # drawing and color transitions of one boid, its position and velocity live in the flock engine arrays
+    def __init__(self, flock: FlockEngine, index: int) -> None:
+        self.flock = flock
+        self.index = index
+        # how far the color is from normal (0) to bounced (1), picks the pre-tinted sprite
+        self.tint = 0.0
         self.colorTimer = 0
-        self.bouncedColor = pygame.Color("#F23B1B")
         self.transitionDuration = 1.0
         self.inBounceTransition = False
 
+    @property
+    def pos(self) -> pygame.Vector2:
+        return pygame.Vector2(*self.flock.pos[self.index])
+
+    @property
+    def vel(self) -> pygame.Vector2:
+        return pygame.Vector2(*self.flock.vel[self.index])
+
+    def startBounceTransition(self) -> None:
+        self.colorTimer = 0.0
+        self.inBounceTransition = True
+
     def changeColourOnBoundariesHit(self, dt):
         if self.inBounceTransition:
             self.colorTimer += dt
@@ -35,147 +95,101 @@ class Boid:
             # normal to bounced
             if t < 0.5:
                 lerpT = t / 0.5
-                self.color = pygame.Color.lerp(self.normalColor, self.bouncedColor, lerpT)
+                self.tint = lerpT
             # bounced to normal
             else:
                 lerpT = (t - 0.5) / 0.5
-                self.color = pygame.Color.lerp(self.bouncedColor, self.normalColor, lerpT)
+                self.tint = 1 - lerpT
             
             # reset when finished
             if t >= 1.0:
                 self.inBounceTransition = False
-                self.color = self.normalColor
-    
-    def getNeighbors(self, boids: list) -> list:
-        neighbors = []
-        
-        for other in boids:
-            if (other != self) and (pygame.Vector2.distance_to(self.pos, other.pos) <= self.minDistanceToNeighbor):
-                neighbors.append(other)
-        
-        return neighbors
-    
-    def separation(self, boids: list) -> pygame.Vector2:
-        sepVec = pygame.Vector2(0, 0)
-        neighbors = self.getNeighbors(boids)
-        for neighbor in neighbors:
-            sepVec = sepVec + (self.pos - neighbor.pos)
-        
-        if neighbors and sepVec.length() > 0:
-            return sepVec.normalize() * self.separationWeight
-        return pygame.Vector2(0, 0)
-        
-    def alignment(self, boids) -> pygame.Vector2:
-        neighbors = self.getNeighbors(boids)
-
-        if not neighbors:
-            return pygame.Vector2(0, 0)
-        
-        avgVelNearbyNeighbors = sum((neighbor.vel for neighbor in neighbors), pygame.Vector2(0, 0)) / len(neighbors)
-        steeringVec = (avgVelNearbyNeighbors - self.vel) 
-        
-        return steeringVec.normalize() * self.alignmentWeight
-    
-    def cohesion(self, boids) -> pygame.Vector2:
-        neighbors = self.getNeighbors(boids)
-        
-        if not neighbors:
-            return pygame.Vector2(0, 0)
-        
-        avgPosNeighbors = sum((neighbor.pos for neighbor in neighbors), pygame.Vector2(0, 0)) / len(neighbors)
-        vecToAvgCenter = avgPosNeighbors - self.pos
-        return vecToAvgCenter.normalize() * self.cohesionWeight
-    
-    def updateBoidPos(self, dt, boids) -> None:
-        self.vel += self.separation(boids) + self.alignment(boids) + self.cohesion(boids)
-        
-        if(self.vel.length() > self.maxSpeed):
-            self.vel.scale_to_length(self.maxSpeed)
-        
-        self.pos = self.pos + self.vel * dt
-    
-    def handleBoundaries(self) -> None:
-        bounced = False
-        if(self.pos.x < 0):
-            self.pos.x = 0
-            self.vel.x *= -1
-            bounced = True
-        if(self.pos.x > GAME_WIDTH):
-            self.pos.x = GAME_WIDTH
-            self.vel.x *= -1
-            bounced = True
-        if(self.pos.y < 0):
-            self.pos.y = 0
-            self.vel.y *= -1
-            bounced = True
-        if(self.pos.y > GAME_HEIGHT):
-            self.pos.y = GAME_HEIGHT
-            self.vel.y *= -1
-            bounced = True
-        
-        if bounced:
-            self.colorTimer = 0.0
-            self.inBounceTransition = True
-    
-    def draw(self, screen):
-        baseTriangle = [
-            pygame.Vector2(0, -2.5),
-            pygame.Vector2(-1.5, 1.5),
-            pygame.Vector2(1.5, 1.5)
-        ]
-    
-        if self.vel.length() > 0: # avoid division by 0
-            angle = self.vel.angle_to(pygame.Vector2(0, -1))
-        else:
-            angle = 0
-        
-        # rotate and translate to boid position
-        scaledBaseTriangle = [vec * self.vertexOffset for vec in baseTriangle]
-        rotated = [p.rotate(-angle) for p in scaledBaseTriangle]
-        moved = [self.pos + p for p in rotated]
-        
-        # draw
-        pygame.draw.polygon(screen, self.color, moved)
+                self.tint = 0.0
     
 class Simulation:
-    def __init__(self) -> None:
-        self.numBoids = 50
+    def __init__(self, simSpeedMultiplier: float = 1.0, numBoids: int = 50, numWorkers: int = 1, steeringInterval: int = 1,
+                 physicsBudget: float = None, obstacles: SignedDistanceField = None) -> None:
+        self.numBoids = numBoids
         self.boids = []
         self.separationSlider = None
         self.alignmentSlider = None
         self.cohesionSlider = None
+        self.obstacleSlider = None
         self.sizeSlider = None
         self.separationOutput = None
         self.alignmentOutput = None
         self.cohesionOutput = None
+        self.obstacleOutput = None
         self.sizeOutput = None
         self.resetButton = None
+        self.timestep = FixedTimestep(1 / 60, speedMultiplier=simSpeedMultiplier)
+        # with more than one worker the flock is updated in parallel strips by a process pool, the strips steer every boid
+        # every tick so there is no steering interval to stagger or adapt
+        if numWorkers > 1 and (steeringInterval != 1 or physicsBudget is not None):
+            raise ValueError("the steering interval and the physics budget need a single worker")
+        if numWorkers > 1:
+            self.flock = ParallelFlockEngine(GAME_WIDTH, GAME_HEIGHT, NEIGHBOR_RADIUS, capacity=numBoids, numWorkers=numWorkers, obstacles=obstacles)
+        else:
+            self.flock = FlockEngine(GAME_WIDTH, GAME_HEIGHT, NEIGHBOR_RADIUS, obstacles=obstacles)
+        self.obstacleSurface = None
+        # only 1/k of the flock re-evaluates its steering per tick, with a physics budget (seconds per frame) k adapts to it
+        self.flock.steeringInterval = steeringInterval
+        self.physicsBudget = physicsBudget
+        self.spriteAtlas = BoidSpriteAtlas()
+        # tint of every boid for the atlas, only boids in a bounce transition are updated
+        self.boidTints = np.zeros(0)
+        self.transitioningBoids = set()
     
+    def createObstacleSurface(self) -> None:
+        # obstacles never move, they are drawn once into their own surface
+        obstacles = self.flock.obstacles
+        if obstacles is None:
+            return
+        self.obstacleSurface = pygame.Surface((GAME_WIDTH, GAME_HEIGHT), pygame.SRCALPHA)
+        if obstacles.polygons:
+            for polygon in obstacles.polygons:
+                pygame.draw.polygon(self.obstacleSurface, OBSTACLE_COLOR, polygon.tolist())
+        else:
+            cells = pygame.Surface(obstacles.mask.shape[::-1], pygame.SRCALPHA)
+            cells.fill(OBSTACLE_COLOR)
+            pygame.surfarray.pixels_alpha(cells)[:] = obstacles.mask.T * 255
+            self.obstacleSurface.blit(pygame.transform.scale(cells, (round(cells.get_width() * obstacles.cellSize), round(cells.get_height() * obstacles.cellSize))), (0, 0))
+
     def createBoids(self) -> None:
-        for _ in range(0, self.numBoids):
-            boid = Boid()
-            self.boids.append(boid)
+        for index in self.flock.addBoids(self.numBoids):
+            self.boids.append(Boid(self.flock, int(index)))
+        self.boidTints = np.zeros(len(self.boids))
     
+    def updateColorTransitions(self, dt: float) -> None:
+        for index in list(self.transitioningBoids):
+            boid = self.boids[index]
+            boid.changeColourOnBoundariesHit(dt)
+            self.boidTints[index] = boid.tint
+            if not boid.inBounceTransition:
+                self.transitioningBoids.discard(index)
+
     def resetWeights(self):
         originalWeightValue = 0.5
+        originalObstacleWeightValue = 3.0
         originalVertexOffsetValue = 4
         
         if len(self.boids) == 0 or self.boids is None:
             return
         
-        for boid in self.boids:
-            boid.separationWeight = originalWeightValue
-            boid.alignmentWeight = originalWeightValue
-            boid.cohesionWeight = originalWeightValue
-            boid.vertexOffset = originalVertexOffsetValue
+        self.flock.separationWeight = originalWeightValue
+        self.flock.alignmentWeight = originalWeightValue
+        self.flock.cohesionWeight = originalWeightValue
+        self.flock.obstacleWeight = originalObstacleWeightValue
 
-        self.separationSlider.setValue(boid.separationWeight)
-        self.alignmentSlider.setValue(boid.alignmentWeight)
-        self.cohesionSlider.setValue(boid.cohesionWeight)
-        self.sizeSlider.setValue(float(boid.vertexOffset))
+        self.separationSlider.setValue(self.flock.separationWeight)
+        self.alignmentSlider.setValue(self.flock.alignmentWeight)
+        self.cohesionSlider.setValue(self.flock.cohesionWeight)
+        self.obstacleSlider.setValue(self.flock.obstacleWeight)
+        self.sizeSlider.setValue(float(originalVertexOffsetValue))
         self.separationOutput.setText(f"Separation: {self.separationSlider.getValue():.2f}")
         self.alignmentOutput.setText(f"Alignment: {self.alignmentSlider.getValue():.2f}")
         self.cohesionOutput.setText(f"Cohesion: {self.cohesionSlider.getValue():.2f}")
+        self.obstacleOutput.setText(f"Obstacles: {self.obstacleSlider.getValue():.2f}")
         self.sizeOutput.setText(f"Boid Size: {float(self.sizeSlider.getValue())}")
     
     def createButtonBorder(self, screen, button: Button) -> None:
@@ -186,29 +200,35 @@ class Simulation:
         
     
     def createWidgets(self, screen) -> None:
-        self.sizeSlider = Slider(screen, 100, 680, 200, 20, min=1.0, max=10, step=0.5, 
+        self.sizeSlider = Slider(screen, 60, 680, 180, 20, min=1.0, max=10, step=0.5, 
+                                    colour=(85, 140, 244), inactiveColour=(85, 140, 244), handleColour=(252,237,187), handleBorderColour=(255, 255, 255), 
+                                    handleRadius=14, curved=True)
+        self.separationSlider = Slider(screen, 280, 680, 180, 20, min=0, max=2, step=0.1, start=0.5, 
                                     colour=(85, 140, 244), inactiveColour=(85, 140, 244), handleColour=(252,237,187), handleBorderColour=(255, 255, 255), 
                                     handleRadius=14, curved=True)
-        self.separationSlider = Slider(screen, 350, 680, 200, 20, min=0, max=2, step=0.1, start=0.5, 
+        self.alignmentSlider = Slider(screen, 500, 680, 180, 20, min=0, max=2, step=0.1, start=0.5, 
                                     colour=(85, 140, 244), inactiveColour=(85, 140, 244), handleColour=(252,237,187), handleBorderColour=(255, 255, 255), 
                                     handleRadius=14, curved=True)
-        self.alignmentSlider = Slider(screen, 600, 680, 200, 20, min=0, max=2, step=0.1, start=0.5, 
+        self.cohesionSlider = Slider(screen, 720, 680, 180, 20, min=0, max=2, step=0.1, start=0.5, 
                                     colour=(85, 140, 244), inactiveColour=(85, 140, 244), handleColour=(252,237,187), handleBorderColour=(255, 255, 255), 
                                     handleRadius=14, curved=True)
-        self.cohesionSlider = Slider(screen, 850, 680, 200, 20, min=0, max=2, step=0.1, start=0.5, 
+        # obstacle avoidance has to turn a boid around within the avoidance distance, so it goes higher than the other rules
+        self.obstacleSlider = Slider(screen, 940, 680, 180, 20, min=0, max=10, step=0.5, start=3.0, 
                                     colour=(85, 140, 244), inactiveColour=(85, 140, 244), handleColour=(252,237,187), handleBorderColour=(255, 255, 255), 
                                     handleRadius=14, curved=True)
-        self.separationOutput = TextBox(screen, 400, 650, 110, 20, fontSize=15, textColour=(255, 255, 255), borderThickness=0, colour=(85, 140, 244))
-        self.alignmentOutput = TextBox(screen, 650, 650, 110, 20, fontSize=15, textColour=(255, 255, 255), borderThickness=0, colour=(85, 140, 244))
-        self.cohesionOutput = TextBox(screen, 900, 650, 110, 20, fontSize=15, textColour=(255, 255, 255), borderThickness=0, colour=(85, 140, 244))
-        self.sizeOutput = TextBox(screen, 160, 650, 110, 20, fontSize=15, textColour=(255, 255, 255), borderThickness=0, colour=(85, 140, 244))
+        self.separationOutput = TextBox(screen, 315, 650, 110, 20, fontSize=15, textColour=(255, 255, 255), borderThickness=0, colour=(85, 140, 244))
+        self.alignmentOutput = TextBox(screen, 535, 650, 110, 20, fontSize=15, textColour=(255, 255, 255), borderThickness=0, colour=(85, 140, 244))
+        self.cohesionOutput = TextBox(screen, 755, 650, 110, 20, fontSize=15, textColour=(255, 255, 255), borderThickness=0, colour=(85, 140, 244))
+        self.obstacleOutput = TextBox(screen, 975, 650, 110, 20, fontSize=15, textColour=(255, 255, 255), borderThickness=0, colour=(85, 140, 244))
+        self.sizeOutput = TextBox(screen, 95, 650, 110, 20, fontSize=15, textColour=(255, 255, 255), borderThickness=0, colour=(85, 140, 244))
         
-        self.resetButton = Button(screen, x=1100, y=650, width=80, height=50, fontSize=20, inactiveColour=(40, 44, 52), pressedColor=(242, 59, 27), 
+        self.resetButton = Button(screen, x=1170, y=650, width=80, height=50, fontSize=20, inactiveColour=(40, 44, 52), pressedColor=(242, 59, 27), 
                                   hoverColour=(242, 59, 27), textColour=(255, 255, 255), text="RESET", onClick=self.resetWeights)
         
         self.separationOutput.disable()
         self.alignmentOutput.disable()
         self.cohesionOutput.disable()
+        self.obstacleOutput.disable()
         self.sizeOutput.disable()
     
     def setSlidersValue(self) -> None:
@@ -216,6 +236,7 @@ class Simulation:
             self.separationSlider.setValue(0.5)
             self.alignmentSlider.setValue(0.5)
             self.cohesionSlider.setValue(0.5)
+            self.obstacleSlider.setValue(3.0)
             self.sizeSlider.setValue(4.0)        
 
     
@@ -224,6 +245,7 @@ class Simulation:
             self.separationOutput.setText(f"Separation: {self.separationSlider.getValue():.2f}")
             self.alignmentOutput.setText(f"Alignment: {self.alignmentSlider.getValue():.2f}")
             self.cohesionOutput.setText(f"Cohesion: {self.cohesionSlider.getValue():.2f}")
+            self.obstacleOutput.setText(f"Obstacles: {self.obstacleSlider.getValue():.2f}")
             self.sizeOutput.setText(f"Boid Size: {float(self.sizeSlider.getValue())}")
     
     def update(self) -> None:
@@ -232,48 +254,86 @@ class Simulation:
         pygame.display.set_caption("Boids Flocking Simulation")
         clock = pygame.time.Clock()
         isRunning = True
-        dt = 0
+        frameTime = 0
         
         # creating widgets
         self.createWidgets(screen)
         # force sliders to start at value given
         self.setSlidersValue()
         self.createButtonBorder(screen, self.resetButton)
+        self.createObstacleSurface()
         
         while(isRunning):
             events = pygame.event.get()
             for event in events:
                 if event.type == pygame.QUIT:
                     isRunning = False
+                # UP / DOWN changes the simulation speed
+                if self.timestep.handleSpeedKeys(event):
+                    pygame.display.set_caption(f"Boids Flocking Simulation (x{self.timestep.speedMultiplier:g})")
             
             screen.fill("#282c34")
+            if self.obstacleSurface is not None:
+                screen.blit(self.obstacleSurface, (0, 0))
             
-            for boid in self.boids:
-                boid.separationWeight = self.separationSlider.getValue()  
-                boid.alignmentWeight = self.alignmentSlider.getValue()
-                boid.cohesionWeight = self.cohesionSlider.getValue()
-                boid.vertexOffset = self.sizeSlider.getValue()
+            # the weights are set once per frame on the engine, not copied into every boid
+            self.flock.separationWeight = self.separationSlider.getValue()
+            self.flock.alignmentWeight = self.alignmentSlider.getValue()
+            self.flock.cohesionWeight = self.cohesionSlider.getValue()
+            self.flock.obstacleWeight = self.obstacleSlider.getValue()
 
-                boid.handleBoundaries()
-                boid.changeColourOnBoundariesHit(dt)
-                boid.updateBoidPos(dt, self.boids)
-                boid.draw(screen)
+            # fixed physics substeps, independent of the frame rate
+            dt = self.timestep.stepSize
+            physicsStart = time.perf_counter()
+            for _ in self.timestep.substeps(frameTime):
+                self.flock.step(dt)
+                for index in np.flatnonzero(self.flock.bounced):
+                    self.boids[index].startBounceTransition()
+                    self.transitioningBoids.add(int(index))
+                self.updateColorTransitions(dt)
+            if self.physicsBudget is not None:
+                self.flock.adaptSteeringInterval(time.perf_counter() - physicsStart, self.physicsBudget)
+            
+            # draw between the last two physics states, the atlas is only rebuilt when the size slider moved
+            self.spriteAtlas.build(self.sizeSlider.getValue(), BOID_COLOR, BOUNCED_COLOR)
+            renderPos = self.timestep.interpolate(self.flock.previousPos, self.flock.pos, self.timestep.alpha)
+            self.spriteAtlas.draw(screen, renderPos, self.flock.vel, self.boidTints)
             
             # labels and button border
             self.setLabelsValue()
             self.createButtonBorder(screen, self.resetButton)
 
             pygame_widgets.update(events)
-            update([self.separationSlider, self.alignmentSlider, self.cohesionSlider, self.sizeSlider, self.separationOutput, 
-                    self.alignmentOutput, self.cohesionOutput, self.sizeOutput, self.resetButton])
+            update([self.separationSlider, self.alignmentSlider, self.cohesionSlider, self.obstacleSlider, self.sizeSlider, self.separationOutput, 
+                    self.alignmentOutput, self.cohesionOutput, self.obstacleOutput, self.sizeOutput, self.resetButton])
             pygame.display.update()
             pygame.display.flip()
             
-            dt = clock.tick(60) / 1000
+            frameTime = clock.tick(60) / 1000
 
+        if isinstance(self.flock, ParallelFlockEngine):
+            self.flock.close()
         pygame.quit()
 
 if __name__ == "__main__":
-    simulation = Simulation()
+    parser = argparse.ArgumentParser(description="Boids flocking simulation")
+    parser.add_argument("--boids", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=1, help="processes updating the flock, 1 runs it in this process")
+    parser.add_argument("--steering-interval", type=int, default=1, help="steer 1/k of the flock per tick (single process only)")
+    parser.add_argument("--physics-budget", type=float, default=None, help="milliseconds of physics per frame, adapts the steering interval (single process only)")
+    parser.add_argument("--obstacles", default=None, help="polygon list (.json) or mask image of the obstacles, 'none' for an open field")
+    args = parser.parse_args()
+    if args.workers > 1 and (args.steering_interval != 1 or args.physics_budget is not None):
+        parser.error("--steering-interval and --physics-budget only work with --workers 1")
+
+    if args.obstacles is None:
+        obstacles = SignedDistanceField.fromPolygons(OBSTACLE_POLYGONS, GAME_WIDTH, GAME_HEIGHT)
+    elif args.obstacles.lower() == "none":
+        obstacles = None
+    else:
+        obstacles = SignedDistanceField.load(args.obstacles, GAME_WIDTH, GAME_HEIGHT)
+    physicsBudget = args.physics_budget / 1000 if args.physics_budget is not None else None
+    simulation = Simulation(numBoids=args.boids, numWorkers=args.workers, steeringInterval=args.steering_interval,
+                            physicsBudget=physicsBudget, obstacles=obstacles)
     simulation.createBoids()
     simulation.update()
\ No newline at end of file
@@ -0,0 +1,400 @@
+import heapq
+import numpy as np
+from spatialHash import SpatialHashGrid
+from telemetry import TelemetryBuffer
+
+# wolves, rabbits and grass as arrays: the rules of the per-object model run as masked operations over a whole
+# species. newborns are written into spare capacity right away, deaths are only flagged, and every species is
+# compacted in one pass at the end of the tick. grass is a biomass grid instead of individual patches.
+# rest and move timers are not counted down: agents are filed under the tick of their next state change in a heap
+# of due ticks, so a tick only touches the agents that move or whose timer runs out. counts and energies are kept
+# up to date from the same events and recorded once per tick into a telemetry ring buffer
+
+REST, MOVE = 0, 1
+# per-agent arrays of a population
+FIELDS = {"x": np.float64, "y": np.float64, "previousX": np.float64, "previousY": np.float64, "dx": np.float64,
+          "dy": np.float64, "energy": np.float64, "state": np.int8, "dueTick": np.int64, "uid": np.int64}
+# per species columns of a telemetry record
+STATS_FIELDS = ("", "EnergySum", "MinEnergy", "MaxEnergy", "Births", "Deaths")
+
+class SpeciesSpec:
+    # the constants of one species, the defaults of the per-object Wolf/Rabbit classes
+    def __init__(self, energy: float, energyLossPerMove: float, energyGain: float, reproductionThreshold: float, radius: float,
+                 maxEnergy: float, restTime: tuple, moveTime: tuple, maxStep: int, newbornEnergy: float, birthOffset: int,
+                 loseEnergyOnRest: bool) -> None:
+        self.energy = energy
+        self.energyLossPerMove = energyLossPerMove
+        self.energyGain = energyGain
+        self.reproductionThreshold = reproductionThreshold
+        self.radius = radius
+        self.maxEnergy = maxEnergy
+        # inclusive ranges of the rest and move durations in ticks
+        self.restTime = restTime
+        self.moveTime = moveTime
+        self.maxStep = maxStep
+        self.newbornEnergy = newbornEnergy
+        self.birthOffset = birthOffset
+        # wolves pay for a move when they stop, rabbits when they start
+        self.loseEnergyOnRest = loseEnergyOnRest
+
+
+def createRabbitSpec() -> SpeciesSpec:
+    return SpeciesSpec(energy=70, energyLossPerMove=0.3, energyGain=25, reproductionThreshold=90, radius=5, maxEnergy=100,
+                       restTime=(10, 50), moveTime=(10, 30), maxStep=2, newbornEnergy=30, birthOffset=7, loseEnergyOnRest=False)
+
+
+def createWolfSpec() -> SpeciesSpec:
+    return SpeciesSpec(energy=120, energyLossPerMove=1, energyGain=60, reproductionThreshold=170, radius=10, maxEnergy=200,
+                       restTime=(40, 100), moveTime=(20, 60), maxStep=3, newbornEnergy=70, birthOffset=5, loseEnergyOnRest=True)
+
+
+class PopulationStats:
+    # running aggregates of a population, updated by every event that changes them instead of rescanning the agents.
+    # min and max only move past new values, they are recomputed once at the next record if an agent holding one
+    # changes or dies
+    def __init__(self) -> None:
+        self.count = 0
+        self.energySum = 0.0
+        self.minEnergy = np.inf
+        self.maxEnergy = -np.inf
+        self.isExtremeStale = False
+        # since the last record
+        self.births = 0
+        self.deaths = 0
+
+    def includeEnergies(self, energy: np.ndarray) -> None:
+        if len(energy):
+            self.minEnergy = min(self.minEnergy, float(energy.min()))
+            self.maxEnergy = max(self.maxEnergy, float(energy.max()))
+
+    def holdsExtreme(self, energy: np.ndarray) -> bool:
+        return len(energy) > 0 and bool(np.any(energy <= self.minEnergy) or np.any(energy >= self.maxEnergy))
+
+    def onAdd(self, energy: np.ndarray) -> None:
+        self.count += len(energy)
+        self.energySum += float(np.sum(energy))
+        self.includeEnergies(energy)
+
+    def onEnergyChange(self, oldEnergy: np.ndarray, newEnergy: np.ndarray) -> None:
+        self.energySum += float(np.sum(newEnergy) - np.sum(oldEnergy))
+        self.isExtremeStale |= self.holdsExtreme(oldEnergy)
+        self.includeEnergies(newEnergy)
+
+    def onRemove(self, energy: np.ndarray) -> None:
+        self.count -= len(energy)
+        self.deaths += len(energy)
+        self.energySum -= float(np.sum(energy))
+        self.isExtremeStale |= self.holdsExtreme(energy)
+
+    def takeRecord(self, energy: np.ndarray) -> tuple:
+        # (count, energy sum, min, max, births, deaths), births and deaths start counting again afterwards
+        if self.count == 0:
+            self.energySum, self.minEnergy, self.maxEnergy = 0.0, np.inf, -np.inf
+        elif self.isExtremeStale:
+            self.minEnergy, self.maxEnergy = float(energy.min()), float(energy.max())
+        self.isExtremeStale = False
+        extremes = (self.minEnergy, self.maxEnergy) if self.count else (np.nan, np.nan)
+        record = (self.count, self.energySum) + extremes + (self.births, self.deaths)
+        self.births = self.deaths = 0
+        return record
+
+
+class Population:
+    # one species in capacity-doubling buffers, population.x etc. are views of the live agents
+    def __init__(self, spec: SpeciesSpec, width: float, height: float, capacity: int = 64) -> None:
+        self.spec = spec
+        self.width = width
+        self.height = height
+        self.count = 0
+        # ticks moved so far, and the ids handed out so far. ids grow with the rows, so the uid column stays sorted
+        self.tick = 0
+        self.nextUid = 0
+        # heap of the ticks that have agents due, and the uids due at each of them. every agent is filed once,
+        # the uids of dead agents are dropped when their tick comes up
+        self.events = []
+        self.dueUids = {}
+        # rows of the moving agents (in no particular order), of the agents that stopped in the last tick and of the
+        # agents that lost energy
+        self.movingRows = np.zeros(0, dtype=np.int64)
+        self.stoppedRows = np.zeros(0, dtype=np.int64)
+        self.spentRows = np.zeros(0, dtype=np.int64)
+        self.stats = PopulationStats()
+        self.buffers = {name: np.zeros(capacity, dtype=dtype) for name, dtype in FIELDS.items()}
+        self.isDeadBuffer = np.zeros(capacity, dtype=bool)
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        if name in FIELDS:
+            return self.buffers[name][:self.count]
+        raise AttributeError(name)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def isDead(self) -> np.ndarray:
+        return self.isDeadBuffer[:self.count]
+
+    def reserve(self, capacity: int) -> None:
+        if capacity <= len(self.isDeadBuffer):
+            return
+        newCapacity = max(capacity, 2 * len(self.isDeadBuffer))
+        for name, buffer in self.buffers.items():
+            self.buffers[name] = np.zeros(newCapacity, dtype=buffer.dtype)
+            self.buffers[name][:self.count] = buffer[:self.count]
+        oldIsDead = self.isDeadBuffer
+        self.isDeadBuffer = np.zeros(newCapacity, dtype=bool)
+        self.isDeadBuffer[:self.count] = oldIsDead[:self.count]
+
+    def randomPositions(self, count: int, rng: np.random.Generator) -> tuple:
+        x = rng.integers(0, int(self.width) - 20, count, endpoint=True)
+        y = rng.integers(0, int(self.height) - 20, count, endpoint=True)
+        return x, y
+
+    def add(self, count: int, rng: np.random.Generator, energy: float = None, elapsed: int = 0, positions: tuple = None) -> np.ndarray:
+        # resting agents at the given or random positions, returns their indices. elapsed ticks of the rest are already over
+        self.reserve(self.count + count)
+        indices = np.arange(self.count, self.count + count)
+        self.count += count
+        x, y = self.randomPositions(count, rng) if positions is None else positions
+        # the lower edge keeps the agent's radius, resting agents are not clamped by a move
+        x = np.maximum(x, self.spec.radius)
+        y = np.maximum(y, self.spec.radius)
+        for name in ("x", "previousX"):
+            self.buffers[name][indices] = x
+        for name in ("y", "previousY"):
+            self.buffers[name][indices] = y
+        self.buffers["dx"][indices] = 0
+        self.buffers["dy"][indices] = 0
+        self.buffers["energy"][indices] = np.clip(self.spec.energy if energy is None else energy, 0, self.spec.maxEnergy)
+        self.stats.onAdd(self.energy[indices])
+        self.buffers["state"][indices] = REST
+        self.buffers["uid"][indices] = np.arange(self.nextUid, self.nextUid + count)
+        self.nextUid += count
+        durations = rng.integers(self.spec.restTime[0], self.spec.restTime[1], count, endpoint=True)
+        self.schedule(indices, durations - elapsed)
+        self.isDeadBuffer[indices] = False
+        return indices
+
+    def schedule(self, indices: np.ndarray, durations: np.ndarray) -> None:
+        # the agents change state again once durations more ticks have been moved
+        dueTicks = self.tick + np.asarray(durations, dtype=np.int64)
+        self.dueTick[indices] = dueTicks
+        order = np.argsort(dueTicks, kind="stable")
+        ticks, firsts = np.unique(dueTicks[order], return_index=True)
+        for dueTick, uids in zip(ticks.tolist(), np.split(self.uid[indices][order], firsts[1:])):
+            if dueTick not in self.dueUids:
+                heapq.heappush(self.events, dueTick)
+                self.dueUids[dueTick] = []
+            self.dueUids[dueTick].append(uids)
+
+    def popDue(self) -> np.ndarray:
+        # rows of the living agents whose timer runs out this tick, in row order
+        batches = []
+        while self.events and self.events[0] <= self.tick:
+            batches.extend(self.dueUids.pop(heapq.heappop(self.events)))
+        uids = np.sort(np.concatenate(batches)) if batches else np.zeros(0, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.uid, uids), max(self.count - 1, 0))
+        isAlive = (self.uid[rows] == uids) if self.count else np.zeros(len(uids), dtype=bool)
+        return rows[isAlive]
+
+    def move(self, rng: np.random.Generator) -> None:
+        spec = self.spec
+        self.tick += 1
+        # resting agents keep their previous position, the ones that stopped last tick catch up once
+        active = np.concatenate((self.movingRows, self.stoppedRows))
+        self.previousX[active] = self.x[active]
+        self.previousY[active] = self.y[active]
+
+        moving = self.movingRows
+        # only the lower edge keeps the agent's radius
+        self.x[moving] = np.clip(self.x[moving] + self.dx[moving], spec.radius, self.width)
+        self.y[moving] = np.clip(self.y[moving] + self.dy[moving], spec.radius, self.height)
+
+        due = self.popDue()
+        isStopping = self.state[due] == MOVE
+        stops = due[isStopping]
+        starts = due[~isStopping]
+        self.state[stops] = REST
+        self.schedule(stops, rng.integers(spec.restTime[0], spec.restTime[1], len(stops), endpoint=True))
+        self.state[starts] = MOVE
+        self.schedule(starts, rng.integers(spec.moveTime[0], spec.moveTime[1], len(starts), endpoint=True))
+        self.dx[starts] = rng.integers(-spec.maxStep, spec.maxStep, len(starts), endpoint=True)
+        self.dy[starts] = rng.integers(-spec.maxStep, spec.maxStep, len(starts), endpoint=True)
+        self.movingRows = np.concatenate((moving[self.state[moving] == MOVE], starts))
+        self.stoppedRows = stops
+
+        # only agents with energy left pay for the move
+        paying = stops if spec.loseEnergyOnRest else starts
+        paying = paying[self.energy[paying] > 0]
+        self.changeEnergy(paying, self.energy[paying] - spec.energyLossPerMove)
+        self.spentRows = paying
+
+    def reproduce(self, energyLoss: float, rng: np.random.Generator) -> np.ndarray:
+        # parents pay energyLoss, newborns appear at a random position plus a small offset like in the object model.
+        # in the object model a newborn is already moved once in the tick it is born, so its timer starts one tick in
+        parents = np.flatnonzero(self.energy >= self.spec.reproductionThreshold)
+        self.changeEnergy(parents, self.energy[parents] - energyLoss)
+        self.stats.births += len(parents)
+        self.spentRows = np.concatenate((self.spentRows, parents))
+        x, y = self.randomPositions(len(parents), rng)
+        newborns = self.add(len(parents), rng, self.spec.newbornEnergy, elapsed=1, positions=(x, y))
+        offset = rng.integers(-self.spec.birthOffset, self.spec.birthOffset, (len(newborns), 2), endpoint=True)
+        self.x[newborns] = np.maximum(x + offset[:, 0], self.spec.radius)
+        self.y[newborns] = np.maximum(y + offset[:, 1], self.spec.radius)
+        self.previousX[newborns] = self.x[newborns]
+        self.previousY[newborns] = self.y[newborns]
+        return newborns
+
+    def changeEnergy(self, indices: np.ndarray, energy: np.ndarray) -> None:
+        # every energy change goes through here so the statistics follow it, indices must not repeat
+        self.stats.onEnergyChange(self.energy[indices], energy)
+        self.energy[indices] = energy
+
+    def gainEnergy(self, indices: np.ndarray) -> None:
+        # one gain per entry in indices, agents without any energy left get nothing
+        meals = np.bincount(indices, minlength=self.count)
+        fed = np.flatnonzero((meals > 0) & (self.energy != 0))
+        self.changeEnergy(fed, np.minimum(self.spec.maxEnergy, self.energy[fed] + meals[fed] * self.spec.energyGain))
+
+    def markStarved(self) -> None:
+        # energy only drops when an agent pays for a move or for reproducing, so only those agents can starve
+        spent = self.spentRows
+        self.isDead[spent[self.energy[spent] <= 0]] = True
+        self.spentRows = np.zeros(0, dtype=np.int64)
+
+    def compact(self) -> None:
+        # drops the dead agents from every array in one pass, order of the survivors is kept
+        isAlive = ~self.isDead
+        survivors = int(np.count_nonzero(isAlive))
+        if survivors == self.count:
+            return
+        self.stats.onRemove(self.energy[~isAlive])
+        for buffer in self.buffers.values():
+            buffer[:survivors] = buffer[:self.count][isAlive]
+        # the row lists follow the survivors to their new rows
+        newRows = np.cumsum(isAlive) - 1
+        self.movingRows = newRows[self.movingRows[isAlive[self.movingRows]]]
+        self.stoppedRows = newRows[self.stoppedRows[isAlive[self.stoppedRows]]]
+        self.count = survivors
+        self.isDead[:] = False
+
+
+class GrassField:
+    # biomass per cell of a coarse grid in units of rabbit energy. it regrows everywhere at the same rate up to a capacity
+    # and rabbits eat from the cell they stand in, so the cost does not depend on how much of the field is covered. the
+    # default rate gives populations close to the old patches (one worth 25 energy every 2 s): a field spread this thin
+    # only feeds the rabbits where they walk, so it needs more total regrowth than the patches had
+    def __init__(self, width: float, height: float, cellSize: float = 8, regrowthRate: float = 0.003, capacity: float = 1.0,
+                 biteSize: float = 0.5) -> None:
+        self.cellSize = cellSize
+        self.numColumns = int(np.ceil(width / cellSize))
+        self.numRows = int(np.ceil(height / cellSize))
+        # [column, row], the layout of pygame.surfarray
+        self.biomass = np.zeros((self.numColumns, self.numRows))
+        # biomass per cell per second
+        self.regrowthRate = regrowthRate
+        self.capacity = capacity
+        # the most a rabbit eats per tick
+        self.biteSize = biteSize
+
+    def regrow(self, dt: float) -> None:
+        np.minimum(self.biomass + self.regrowthRate * dt, self.capacity, out=self.biomass)
+
+    def calcCells(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        # flat index into biomass of the cell under every position
+        column = np.clip((x // self.cellSize).astype(np.int64), 0, self.numColumns - 1)
+        row = np.clip((y // self.cellSize).astype(np.int64), 0, self.numRows - 1)
+        return column * self.numRows + row
+
+    def graze(self, x: np.ndarray, y: np.ndarray, hunger: np.ndarray) -> tuple:
+        # every grazer takes up to a bite (never more than its hunger) from its cell, grazers that share a cell split
+        # what is left in proportion to their bites. returns the amount eaten by every grazer and the cells grazed bare
+        cells = self.calcCells(x, y)
+        wanted = np.clip(hunger, 0.0, self.biteSize)
+        biomass = self.biomass.reshape(-1)
+        demand = np.bincount(cells, weights=wanted, minlength=len(biomass))
+        grazed = np.flatnonzero(demand > 0)
+        share = np.zeros(len(biomass))
+        share[grazed] = np.minimum(1.0, biomass[grazed] / demand[grazed])
+        eaten = wanted * share[cells]
+
+        wasGrown = biomass[grazed] > 0
+        biomass -= np.bincount(cells, weights=eaten, minlength=len(biomass))
+        np.maximum(biomass, 0.0, out=biomass)
+        numGrazedBare = int(np.count_nonzero(wasGrown & (biomass[grazed] <= 1e-9)))
+
+        return eaten, numGrazedBare
+
+
+class EcosystemEngine:
+    def __init__(self, width: float = 1280, height: float = 720, rng: np.random.Generator = None) -> None:
+        self.width = width
+        self.height = height
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.rabbits = Population(createRabbitSpec(), width, height)
+        self.wolves = Population(createWolfSpec(), width, height)
+        self.grass = GrassField(width, height)
+        self.minDistanceToEatRabbit = 15
+        self.energyLossOnRabbitReproduction = 50
+        self.energyLossOnWolfReproduction = 60
+        self.rabbitGrid = SpatialHashGrid(self.minDistanceToEatRabbit)
+        # events of the last tick, for sounds and statistics
+        self.numRabbitsEaten = 0
+        self.numGrassEaten = 0
+        self.grassBiomassEaten = 0.0
+        # one record per tick with the statistics of both species, the newest five minutes of simulated time stay in memory
+        self.tick = 0
+        fields = ["tick"]
+        for species, plural in (("rabbit", "rabbits"), ("wolf", "wolves")):
+            fields += [species + field if field else plural for field in STATS_FIELDS]
+        self.telemetry = TelemetryBuffer(fields, capacity=5 * 60 * 60)
+
+    def findMeals(self, hunterPos: np.ndarray, preyPos: np.ndarray, radius: float) -> tuple:
+        # in hunter order every hunter gets the closest prey in reach that no earlier hunter took
+        self.rabbitGrid.cellSize = radius
+        self.rabbitGrid.build(preyPos)
+        rows, candidates = self.rabbitGrid.queryPairs(hunterPos, radius)
+        dist = np.hypot(*(preyPos[candidates] - hunterPos[rows]).T)
+        byDistance = np.lexsort((dist, rows))
+        isTaken = np.zeros(len(preyPos), dtype=bool)
+        hunters, prey = [], []
+        lastHunter = -1
+        for hunter, candidate in zip(rows[byDistance].tolist(), candidates[byDistance].tolist()):
+            if hunter != lastHunter and not isTaken[candidate]:
+                isTaken[candidate] = True
+                hunters.append(hunter)
+                prey.append(candidate)
+                lastHunter = hunter
+        return np.array(hunters, dtype=np.int64), np.array(prey, dtype=np.int64)
+
+    def step(self, dt: float) -> None:
+        rabbits, wolves = self.rabbits, self.wolves
+
+        rabbits.move(self.rng)
+        rabbits.reproduce(self.energyLossOnRabbitReproduction, self.rng)
+        rabbits.markStarved()
+
+        wolves.move(self.rng)
+        wolves.reproduce(self.energyLossOnWolfReproduction, self.rng)
+
+        # wolves hunt the rabbits that are still alive
+        living = np.flatnonzero(~rabbits.isDead)
+        wolfPos = np.stack((wolves.x, wolves.y), axis=1)
+        rabbitPos = np.stack((rabbits.x[living], rabbits.y[living]), axis=1)
+        hunters, prey = self.findMeals(wolfPos, rabbitPos, self.minDistanceToEatRabbit)
+        wolves.gainEnergy(hunters)
+        rabbits.isDead[living[prey]] = True
+        self.numRabbitsEaten = len(prey)
+        wolves.markStarved()
+
+        # surviving rabbits graze the cell they stand on, the eaten biomass is their energy gain
+        self.grass.regrow(dt)
+        living = np.flatnonzero(~rabbits.isDead)
+        eaten, self.numGrassEaten = self.grass.graze(rabbits.x[living], rabbits.y[living], rabbits.spec.maxEnergy - rabbits.energy[living])
+        rabbits.changeEnergy(living, rabbits.energy[living] + eaten)
+        self.grassBiomassEaten = float(eaten.sum())
+
+        rabbits.compact()
+        wolves.compact()
+        self.tick += 1
+        self.telemetry.record((self.tick,) + rabbits.stats.takeRecord(rabbits.energy) + wolves.stats.takeRecord(wolves.energy))
@@ -0,0 +1,201 @@
+import argparse
+import csv
+import itertools
+import os
+import time
+import numpy as np
+from multiprocessing import Pool
+from ecosystemEngine import EcosystemEngine, Population
+
+# headless parameter sweeps of the wolves and rabbits ecosystem: every parameter point runs with several seeds on a
+# process pool, the population time series of every run is appended to one csv file (one column per quantity) as soon
+# as the run is done, and a summary gives extinction times and the oscillation of both species per point
+
+# parameters are attribute paths on the engine, a population stands for its species spec
+SWEEP_GRID = {
+    "wolves.energyGain": [40, 60, 80],
+    "rabbits.reproductionThreshold": [80, 90, 100],
+    "energyLossOnRabbitReproduction": [30, 50, 70],
+    "grass.regrowthRate": [0.0015, 0.003, 0.006],
+}
+SWEEP_BOUNDS = {
+    "wolves.energyGain": (30, 90),
+    "rabbits.reproductionThreshold": (70, 100),
+    "energyLossOnRabbitReproduction": (20, 70),
+    "grass.regrowthRate": (0.001, 0.01),
+}
+SUMMARY_FIELDS = ("rabbitExtinctFraction", "rabbitExtinctionTime", "wolfExtinctFraction", "wolfExtinctionTime",
+                  "rabbitPeriod", "rabbitAmplitude", "wolfPeriod", "wolfAmplitude")
+
+
+def createGrid(values: dict) -> list:
+    # every combination of the listed values
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*values.values())]
+
+
+def createLatinHypercube(bounds: dict, numPoints: int, rng: np.random.Generator) -> list:
+    # every range is cut into numPoints strata and every stratum is used once, the strata of the parameters are paired at random
+    samples = {}
+    for name, (low, high) in bounds.items():
+        strata = (rng.permutation(numPoints) + rng.random(numPoints)) / numPoints
+        samples[name] = low + strata * (high - low)
+    return [{name: float(samples[name][point]) for name in bounds} for point in range(numPoints)]
+
+
+def applyParameters(ecosystem: EcosystemEngine, parameters: dict) -> None:
+    for name, value in parameters.items():
+        *path, attribute = name.split(".")
+        target = ecosystem
+        for part in path:
+            target = getattr(target, part)
+        if isinstance(target, Population):
+            target = target.spec
+        if not hasattr(target, attribute):
+            raise ValueError(f"unknown parameter {name}")
+        setattr(target, attribute, value)
+
+
+def runSimulation(parameters: dict, seed: int, numTicks: int, recordEvery: int, numRabbits: int = 25, numWolves: int = 3) -> tuple:
+    # population counts every recordEvery ticks, once both species are gone the rest of the series stays 0
+    ecosystem = EcosystemEngine(1280, 720, np.random.default_rng(seed))
+    applyParameters(ecosystem, parameters)
+    ecosystem.rabbits.add(numRabbits, ecosystem.rng)
+    ecosystem.wolves.add(numWolves, ecosystem.rng)
+    ticks = np.arange(0, numTicks + 1, recordEvery)
+    rabbits = np.zeros(len(ticks), dtype=np.int64)
+    wolves = np.zeros(len(ticks), dtype=np.int64)
+    rabbits[0], wolves[0] = len(ecosystem.rabbits), len(ecosystem.wolves)
+
+    for sample in range(1, len(ticks)):
+        if len(ecosystem.rabbits) == 0 and len(ecosystem.wolves) == 0:
+            break
+        for _ in range(recordEvery):
+            ecosystem.step(1 / 60)
+        rabbits[sample], wolves[sample] = len(ecosystem.rabbits), len(ecosystem.wolves)
+
+    return ticks, rabbits, wolves
+
+
+def runTask(task: tuple) -> tuple:
+    run, point, parameters, seed, numTicks, recordEvery = task
+    return (run, point, parameters, seed) + runSimulation(parameters, seed, numTicks, recordEvery)
+
+
+def calcExtinctionTime(counts: np.ndarray, times: np.ndarray) -> float:
+    # first sample without any animal of the species, nan if it survived
+    extinct = np.flatnonzero(counts == 0)
+    return float(times[extinct[0]]) if len(extinct) else float("nan")
+
+
+def calcOscillation(counts: np.ndarray, sampleTime: float) -> tuple:
+    # period from the second peak of the autocorrelation (the first is at lag 0), amplitude as half the spread
+    # between the 5th and 95th percentile. only the part of the series before extinction is used
+    extinct = np.flatnonzero(counts == 0)
+    counts = counts[:extinct[0]] if len(extinct) else counts
+    if len(counts) < 4:
+        return float("nan"), float("nan")
+    amplitude = float(np.percentile(counts, 95) - np.percentile(counts, 5)) / 2
+    values = counts - counts.mean()
+    if not values.any():
+        return float("nan"), amplitude
+
+    autocorrelation = np.correlate(values, values, "full")[len(values) - 1:]
+    # the peak is the highest point of the first positive lobe after the autocorrelation went negative
+    negative = np.flatnonzero(autocorrelation < 0)
+    if len(negative) == 0:
+        return float("nan"), amplitude
+    positive = np.flatnonzero(autocorrelation[negative[0]:] > 0)
+    if len(positive) == 0:
+        return float("nan"), amplitude
+    lobeStart = negative[0] + positive[0]
+    lobeEnd = np.flatnonzero(autocorrelation[lobeStart:] < 0)
+    lobe = autocorrelation[lobeStart:lobeStart + lobeEnd[0]] if len(lobeEnd) else autocorrelation[lobeStart:]
+    period = float(lobeStart + np.argmax(lobe)) * sampleTime
+    return period, amplitude
+
+
+def summarizeRun(times: np.ndarray, rabbits: np.ndarray, wolves: np.ndarray) -> dict:
+    sampleTime = float(times[1] - times[0]) if len(times) > 1 else float("nan")
+    rabbitPeriod, rabbitAmplitude = calcOscillation(rabbits, sampleTime)
+    wolfPeriod, wolfAmplitude = calcOscillation(wolves, sampleTime)
+    rabbitExtinctionTime = calcExtinctionTime(rabbits, times)
+    wolfExtinctionTime = calcExtinctionTime(wolves, times)
+    return {"rabbitExtinctFraction": float(not np.isnan(rabbitExtinctionTime)), "rabbitExtinctionTime": rabbitExtinctionTime,
+            "wolfExtinctFraction": float(not np.isnan(wolfExtinctionTime)), "wolfExtinctionTime": wolfExtinctionTime,
+            "rabbitPeriod": rabbitPeriod, "rabbitAmplitude": rabbitAmplitude, "wolfPeriod": wolfPeriod, "wolfAmplitude": wolfAmplitude}
+
+
+def averageRuns(runSummaries: list) -> dict:
+    # mean over the seeds of a point, nan entries (no extinction, no oscillation) are left out
+    summary = {}
+    for field in SUMMARY_FIELDS:
+        values = np.array([runSummary[field] for runSummary in runSummaries])
+        summary[field] = float(np.mean(values[~np.isnan(values)])) if np.any(~np.isnan(values)) else float("nan")
+    return summary
+
+
+def runSweep(points: list, seeds: list, numTicks: int, recordEvery: int, resultsPath: str, numWorkers: int = None) -> list:
+    # runs every point with every seed and returns one summary per point, runs are written to resultsPath in the
+    # order they finish
+    names = list(points[0]) if points else []
+    tasks = [(run, point, parameters, seed, numTicks, recordEvery)
+             for run, (point, parameters, seed) in enumerate((point, parameters, seed) for point, parameters in enumerate(points) for seed in seeds)]
+    runSummaries = [[] for _ in points]
+    start = time.perf_counter()
+
+    with open(resultsPath, "w", newline="") as file, Pool(numWorkers or os.cpu_count()) as pool:
+        writer = csv.writer(file)
+        writer.writerow(["run", "point", "seed"] + names + ["tick", "time", "rabbits", "wolves"])
+        for numDone, (run, point, parameters, seed, ticks, rabbits, wolves) in enumerate(pool.imap_unordered(runTask, tasks), 1):
+            times = ticks / 60
+            rows = zip(ticks.tolist(), times.tolist(), rabbits.tolist(), wolves.tolist())
+            writer.writerows([run, point, seed] + [parameters[name] for name in names] + list(row) for row in rows)
+            file.flush()
+            runSummaries[point].append(summarizeRun(times, rabbits, wolves))
+            print(f"run {numDone}/{len(tasks)} done ({time.perf_counter() - start:.0f} s)", end="\r")
+    print()
+
+    return [dict(parameters, runs=len(summaries), **averageRuns(summaries)) for parameters, summaries in zip(points, runSummaries)]
+
+
+def writeSummary(summaries: list, path: str) -> None:
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(summaries[0]))
+        writer.writeheader()
+        writer.writerows(summaries)
+
+
+def printSummary(summaries: list) -> None:
+    # times and periods in simulated seconds, extinction times are the mean over the runs that went extinct
+    names = [name for name in summaries[0] if name not in SUMMARY_FIELDS and name != "runs"]
+    header = [name.split(".")[-1][:12] for name in names] + ["rabbits gone", "after s", "wolves gone", "after s",
+                                                             "rabbit T s", "rabbit amp", "wolf T s", "wolf amp"]
+    print(" ".join(f"{title:>12}" for title in header))
+    for summary in summaries:
+        values = [f"{summary[name]:>12.4g}" for name in names]
+        values += [f"{summary['rabbitExtinctFraction']:>12.0%}", f"{summary['rabbitExtinctionTime']:>12.0f}",
+                   f"{summary['wolfExtinctFraction']:>12.0%}", f"{summary['wolfExtinctionTime']:>12.0f}"]
+        values += [f"{summary[field]:>12.1f}" for field in ("rabbitPeriod", "rabbitAmplitude", "wolfPeriod", "wolfAmplitude")]
+        print(" ".join(values))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parameter sweeps of the wolves and rabbits ecosystem")
+    parser.add_argument("--lhs", type=int, default=None, help="latin hypercube with this many points over SWEEP_BOUNDS instead of the SWEEP_GRID grid")
+    parser.add_argument("--seeds", type=int, default=3, help="runs per parameter point")
+    parser.add_argument("--seconds", type=float, default=300, help="simulated seconds per run")
+    parser.add_argument("--record-every", type=int, default=60, help="ticks between two samples of the populations")
+    parser.add_argument("--workers", type=int, default=None, help="processes, defaults to the number of cores")
+    parser.add_argument("--out", default="ecosystemSweep.csv", help="time series of every run, the summary goes next to it")
+    args = parser.parse_args()
+
+    if args.lhs is not None:
+        points = createLatinHypercube(SWEEP_BOUNDS, args.lhs, np.random.default_rng(0))
+    else:
+        points = createGrid(SWEEP_GRID)
+    summaries = runSweep(points, list(range(args.seeds)), int(args.seconds * 60), args.record_every, args.out, args.workers)
+    summaryPath = os.path.splitext(args.out)[0] + "-summary.csv"
+    writeSummary(summaries, summaryPath)
+    printSummary(summaries)
+    print(f"time series in {args.out}, summary in {summaryPath}")
@@ -0,0 +1,415 @@
+import os
+import sys
+import time
+import numpy as np
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from spatialHash import SpatialHashGrid
+from obstacleField import SignedDistanceField
+
+class FlockEngine:
+    # every boid lives in these arrays, the steering rules run as batched operations over neighbor pairs
+    def __init__(self, width: float, height: float, neighborRadius: float = 50, maxSpeed: float = 200, capacity: int = 64,
+                 obstacles: SignedDistanceField = None) -> None:
+        self.width = width
+        self.height = height
+        self.neighborRadius = neighborRadius
+        self.maxSpeed = maxSpeed
+        self.separationWeight = 0.5
+        self.alignmentWeight = 0.5
+        self.cohesionWeight = 0.5
+        # static obstacles, boids closer than obstacleDistance are steered away along the field gradient
+        self.obstacles = obstacles
+        self.obstacleWeight = 3.0
+        self.obstacleDistance = neighborRadius
+        self.count = 0
+        self.grid = SpatialHashGrid(neighborRadius)
+        # double-buffered state: a step reads the front buffers and writes the back ones,
+        # so no boid sees another boid's already updated state
+        self.posBuffers = [np.zeros((capacity, 2)), np.zeros((capacity, 2))]
+        self.velBuffers = [np.zeros((capacity, 2)), np.zeros((capacity, 2))]
+        self.front = 0
+        # boids that hit a wall during the last step
+        self.bouncedBuffer = np.zeros(capacity, dtype=bool)
+        # staggered updates: each tick only every k-th boid (rotating) re-evaluates its steering,
+        # the others keep applying the steering they got last time. k = 1 updates everybody
+        self.steeringInterval = 1
+        self.maxSteeringInterval = 16
+        self.steeringPhase = 0
+        self.heldSteeringBuffer = np.zeros((capacity, 2))
+
+    @property
+    def pos(self) -> np.ndarray:
+        return self.posBuffers[self.front][:self.count]
+
+    @property
+    def vel(self) -> np.ndarray:
+        return self.velBuffers[self.front][:self.count]
+
+    @property
+    def previousPos(self) -> np.ndarray:
+        # state before the last step, used to interpolate rendering
+        return self.posBuffers[1 - self.front][:self.count]
+
+    @property
+    def bounced(self) -> np.ndarray:
+        return self.bouncedBuffer[:self.count]
+
+    @property
+    def heldSteering(self) -> np.ndarray:
+        return self.heldSteeringBuffer[:self.count]
+
+    def reserve(self, capacity: int) -> None:
+        if capacity <= len(self.bouncedBuffer):
+            return
+
+        newCapacity = max(capacity, 2 * len(self.bouncedBuffer))
+        for buffers in (self.posBuffers, self.velBuffers):
+            for slot, oldBuffer in enumerate(buffers):
+                buffers[slot] = np.zeros((newCapacity, 2))
+                buffers[slot][:self.count] = oldBuffer[:self.count]
+        oldBounced = self.bouncedBuffer
+        self.bouncedBuffer = np.zeros(newCapacity, dtype=bool)
+        self.bouncedBuffer[:self.count] = oldBounced[:self.count]
+        oldHeldSteering = self.heldSteeringBuffer
+        self.heldSteeringBuffer = np.zeros((newCapacity, 2))
+        self.heldSteeringBuffer[:self.count] = oldHeldSteering[:self.count]
+
+    def addBoids(self, count: int, rng: np.random.Generator = None) -> np.ndarray:
+        # random positions on the screen and random velocities, returns the new indices
+        rng = np.random.default_rng() if rng is None else rng
+        self.reserve(self.count + count)
+        indices = np.arange(self.count, self.count + count)
+
+        pos = np.stack((rng.integers(0, int(self.width), count, endpoint=True), rng.integers(0, int(self.height), count, endpoint=True)), axis=1)
+        vel = rng.uniform(-100, 100, (count, 2))
+        for buffers, values in ((self.posBuffers, pos), (self.velBuffers, vel)):
+            for buffer in buffers:
+                buffer[indices] = values
+        self.bouncedBuffer[indices] = False
+        self.heldSteeringBuffer[indices] = 0.0
+        self.count += count
+
+        return indices
+
+    def handleBoundaries(self, pos: np.ndarray, vel: np.ndarray) -> np.ndarray:
+        # clamps to the screen and reflects the velocity, in place, returns which boids bounced
+        bounced = np.zeros(len(pos), dtype=bool)
+        for axis, limit in ((0, self.width), (1, self.height)):
+            isOutside = (pos[:, axis] < 0) | (pos[:, axis] > limit)
+            pos[:, axis] = np.clip(pos[:, axis], 0, limit)
+            vel[isOutside, axis] *= -1
+            bounced |= isOutside
+        return bounced
+
+    def handleObstacles(self, pos: np.ndarray, vel: np.ndarray) -> np.ndarray:
+        # boids that ended up inside an obstacle are moved back onto its surface and bounce off it like off a wall
+        if self.obstacles is None:
+            return np.zeros(len(pos), dtype=bool)
+        distance, gradient = self.obstacles.sample(pos)
+        isInside = distance < 0
+        normal = self.normalize(gradient[isInside])
+        pos[isInside] -= distance[isInside, None] * normal
+        normalSpeed = np.einsum("ij,ij->i", vel[isInside], normal)
+        vel[isInside] -= 2 * np.minimum(normalSpeed, 0.0)[:, None] * normal
+        return isInside
+
+    def calcAvoidance(self, pos: np.ndarray) -> np.ndarray:
+        # fourth rule: away from obstacles, growing linearly from 0 at obstacleDistance to full weight at the surface.
+        # one field lookup per boid, so it runs for the whole flock every tick even with staggered steering
+        if self.obstacles is None:
+            return np.zeros_like(pos)
+        distance, gradient = self.obstacles.sample(pos)
+        closeness = np.clip(1 - distance / self.obstacleDistance, 0.0, 1.0)
+        return self.obstacleWeight * closeness[:, None] * self.normalize(gradient)
+
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        # zero vectors stay zero instead of dividing by zero
+        length = np.hypot(vectors[:, 0], vectors[:, 1])
+        safeLength = np.where(length > 0, length, 1.0)
+        return np.where(length[:, None] > 0, vectors / safeLength[:, None], 0.0)
+
+    def calcSteering(self, pos: np.ndarray, vel: np.ndarray, indices: np.ndarray = None) -> np.ndarray:
+        # separation, alignment and cohesion from one neighbor query, summed per boid with bincount.
+        # with indices only those boids are steered (against the whole flock)
+        self.grid.build(pos)
+        if indices is None:
+            i, j = self.grid.pairsWithin(self.neighborRadius)
+            source = np.concatenate((i, j))
+            target = np.concatenate((j, i))
+        else:
+            source, target = self.grid.queryPairs(pos[indices], self.neighborRadius, indices)
+        numSteered = len(pos) if indices is None else len(indices)
+
+        numNeighbors = np.bincount(source, minlength=numSteered).astype(float)
+        hasNeighbors = numNeighbors > 0
+        safeCount = np.where(hasNeighbors, numNeighbors, 1.0)[:, None]
+
+        def sumOverNeighbors(values: np.ndarray) -> np.ndarray:
+            return np.stack([np.bincount(source, weights=values[target, axis], minlength=numSteered) for axis in (0, 1)], axis=1)
+
+        neighborPosSum = sumOverNeighbors(pos)
+        neighborVelSum = sumOverNeighbors(vel)
+        if indices is not None:
+            pos, vel = pos[indices], vel[indices]
+
+        # steer away from the neighbors: sum of (pos - neighborPos)
+        separation = self.normalize(numNeighbors[:, None] * pos - neighborPosSum)
+        # match the neighbors' average velocity
+        alignment = self.normalize(neighborVelSum / safeCount - vel)
+        # steer toward the neighbors' average position
+        cohesion = self.normalize(neighborPosSum / safeCount - pos)
+
+        steering = self.separationWeight * separation + self.alignmentWeight * alignment + self.cohesionWeight * cohesion
+        steering[~hasNeighbors] = 0.0
+        return steering
+
+    def step(self, dt: float) -> None:
+        back = 1 - self.front
+        pos = self.posBuffers[back][:self.count]
+        vel = self.velBuffers[back][:self.count]
+        pos[:] = self.pos
+        vel[:] = self.vel
+
+        self.bounced[:] = self.handleBoundaries(pos, vel) | self.handleObstacles(pos, vel)
+        vel += self.calcAvoidance(pos)
+        if self.steeringInterval <= 1:
+            vel += self.calcSteering(pos, vel)
+        else:
+            # this tick's share of the flock gets fresh steering, everybody applies their held steering
+            steered = np.arange(self.steeringPhase, self.count, self.steeringInterval)
+            self.heldSteering[steered] = self.calcSteering(pos, vel, steered)
+            self.steeringPhase = (self.steeringPhase + 1) % self.steeringInterval
+            vel += self.heldSteering
+
+        self.clampSpeed(vel)
+        pos += vel * dt
+
+        self.front = back
+
+    def clampSpeed(self, vel: np.ndarray) -> None:
+        speed = np.hypot(vel[:, 0], vel[:, 1])
+        isTooFast = speed > self.maxSpeed
+        vel[isTooFast] *= (self.maxSpeed / speed[isTooFast])[:, None]
+
+    def adaptSteeringInterval(self, elapsed: float, budget: float) -> None:
+        # doubles k when the measured time is over budget and halves it when there is plenty of room,
+        # the gap between the two thresholds keeps k from flipping every frame
+        if elapsed > budget and self.steeringInterval < self.maxSteeringInterval:
+            self.steeringInterval = min(self.steeringInterval * 2, self.maxSteeringInterval)
+        elif elapsed < 0.4 * budget and self.steeringInterval > 1:
+            self.steeringInterval //= 2
+        self.steeringPhase %= self.steeringInterval
+
+    def calcOrderParameters(self) -> tuple:
+        # polarization: length of the mean heading, 1 when everybody flies the same way, ~0 for random headings.
+        # milling: mean angular momentum of the headings around the flock center, 1 for a perfect vortex.
+        # cohesion: mean number of neighbors within the neighbor radius
+        if self.count == 0:
+            return 0.0, 0.0, 0.0
+        headings = self.normalize(self.vel)
+        polarization = float(np.hypot(*headings.mean(axis=0)))
+        fromCenter = self.normalize(self.pos - self.pos.mean(axis=0))
+        milling = float(abs(np.mean(fromCenter[:, 0] * headings[:, 1] - fromCenter[:, 1] * headings[:, 0])))
+        self.grid.build(self.pos)
+        i, _ = self.grid.pairsWithin(self.neighborRadius)
+        cohesion = 2 * len(i) / self.count
+
+        return polarization, milling, cohesion
+
+
+# shared arrays and obstacles as seen by a pool worker, attached once when the worker starts
+workerArrays = {}
+workerObstacles = None
+
+def attachSharedArrays(layout: dict, obstacles: SignedDistanceField = None) -> None:
+    global workerObstacles
+    workerObstacles = obstacles
+    for key, (name, shape, dtype) in layout.items():
+        # workers share the parent's resource tracker, the parent unlinks the memory in close()
+        sharedMemory = SharedMemory(name=name)
+        workerArrays[key] = (sharedMemory, np.ndarray(shape, dtype=dtype, buffer=sharedMemory.buf))
+
+
+def stepStrip(task: tuple) -> None:
+    # updates the boids of one strip: reads the front buffers for the strip plus a halo of one neighbor radius,
+    # writes only the boids it owns into the back buffers
+    front, count, strip, dt, settings = task
+    width, height, neighborRadius, maxSpeed, weights, obstacleDistance = settings
+    pos = workerArrays[f"pos{front}"][1][:count]
+    vel = workerArrays[f"vel{front}"][1][:count]
+
+    x = np.clip(pos[:, 0], 0, width)
+    isOwned = workerArrays["strip"][1][:count] == strip
+    if not np.any(isOwned):
+        return
+    # walls and obstacles move boids a little before the neighbor query, so they are handled on a wider band
+    # and the halo is cut from the corrected positions
+    ownedX = x[isOwned]
+    band = np.flatnonzero((x >= ownedX.min() - 2 * neighborRadius) & (x <= ownedX.max() + 2 * neighborRadius))
+
+    flock = FlockEngine(width, height, neighborRadius, maxSpeed, obstacles=workerObstacles)
+    flock.separationWeight, flock.alignmentWeight, flock.cohesionWeight, flock.obstacleWeight = weights
+    flock.obstacleDistance = obstacleDistance
+    bandPos = pos[band]
+    bandVel = vel[band]
+    bandBounced = flock.handleBoundaries(bandPos, bandVel) | flock.handleObstacles(bandPos, bandVel)
+
+    isBandOwned = isOwned[band]
+    ownedX = bandPos[isBandOwned, 0]
+    isLocal = (bandPos[:, 0] >= ownedX.min() - neighborRadius) & (bandPos[:, 0] <= ownedX.max() + neighborRadius)
+    local = band[isLocal]
+    isLocalOwned = isBandOwned[isLocal]
+    localPos = bandPos[isLocal]
+    localVel = bandVel[isLocal]
+    bounced = bandBounced[isLocal]
+    localVel += flock.calcAvoidance(localPos)
+    steering = flock.calcSteering(localPos, localVel)
+
+    newVel = localVel[isLocalOwned] + steering[isLocalOwned]
+    flock.clampSpeed(newVel)
+    owned = local[isLocalOwned]
+    back = 1 - front
+    workerArrays[f"pos{back}"][1][owned] = localPos[isLocalOwned] + newVel * dt
+    workerArrays[f"vel{back}"][1][owned] = newVel
+    workerArrays["bounced"][1][owned] = bounced[isLocalOwned]
+
+
+class ParallelFlockEngine(FlockEngine):
+    # same flock with the state in shared memory, every tick the world is split into vertical strips
+    # holding the same number of boids and a process pool updates the strips in parallel
+    def __init__(self, width: float, height: float, neighborRadius: float = 50, maxSpeed: float = 200, capacity: int = 100000,
+                 numWorkers: int = None, stripsPerWorker: int = 2, obstacles: SignedDistanceField = None) -> None:
+        super().__init__(width, height, neighborRadius, maxSpeed, capacity=1, obstacles=obstacles)
+        self.capacity = capacity
+        self.numWorkers = numWorkers or os.cpu_count() or 1
+        # a few strips per worker keep the pool busy when strips differ in cost
+        self.numStrips = self.numWorkers * stripsPerWorker
+
+        self.sharedMemory = []
+        layout = {}
+        arrays = {}
+        for key, shape, dtype in (("pos0", (capacity, 2), np.float64), ("pos1", (capacity, 2), np.float64),
+                                  ("vel0", (capacity, 2), np.float64), ("vel1", (capacity, 2), np.float64),
+                                  ("bounced", (capacity,), np.bool_), ("strip", (capacity,), np.int32)):
+            sharedMemory = SharedMemory(create=True, size=max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1))
+            self.sharedMemory.append(sharedMemory)
+            layout[key] = (sharedMemory.name, shape, dtype)
+            arrays[key] = np.ndarray(shape, dtype=dtype, buffer=sharedMemory.buf)
+            arrays[key][:] = 0
+
+        # the front buffers are the published snapshot, workers only ever write the back buffers
+        self.posBuffers = [arrays["pos0"], arrays["pos1"]]
+        self.velBuffers = [arrays["vel0"], arrays["vel1"]]
+        self.bouncedBuffer = arrays["bounced"]
+        # staggered steering is not supported here, every boid is steered every tick
+        self.heldSteeringBuffer = np.zeros((capacity, 2))
+        # strip of every boid for the current tick
+        self.stripBuffer = arrays["strip"]
+        self.pool = Pool(self.numWorkers, initializer=attachSharedArrays, initargs=(layout, obstacles))
+
+    def reserve(self, capacity: int) -> None:
+        if capacity > self.capacity:
+            raise ValueError(f"parallel flock holds at most {self.capacity} boids, create it with a larger capacity")
+
+    def step(self, dt: float) -> None:
+        if self.count == 0:
+            return
+
+        # strip bounds from quantiles of x, so every strip holds about the same number of boids.
+        # ownership uses the clamped x, exactly where the wall bounce will place the boids
+        x = np.clip(self.pos[:, 0], 0, self.width)
+        stripBounds = np.quantile(x, np.linspace(0, 1, self.numStrips + 1)[1:-1])
+        self.stripBuffer[:self.count] = np.searchsorted(stripBounds, x, side="right")
+        weights = (self.separationWeight, self.alignmentWeight, self.cohesionWeight, self.obstacleWeight)
+        settings = (self.width, self.height, self.neighborRadius, self.maxSpeed, weights, self.obstacleDistance)
+        tasks = [(self.front, self.count, strip, dt, settings) for strip in range(self.numStrips)]
+
+        # steeringInterval is ignored, strips always steer all of their boids
+        self.pool.map(stepStrip, tasks)
+        self.front = 1 - self.front
+
+    def close(self) -> None:
+        self.pool.close()
+        self.pool.join()
+        for sharedMemory in self.sharedMemory:
+            sharedMemory.close()
+            sharedMemory.unlink()
+        self.sharedMemory = []
+
+
+def compareEngines(count: int = 100000, workerCounts: tuple = (1, 2, 4, 8), steps: int = 5, density: float = 50 / (1280 * 720)) -> None:
+    # throughput of the parallel engine against the single-process one, on the same flock
+    side = np.sqrt(count / density)
+    rng = np.random.default_rng(0)
+    reference = FlockEngine(side, side)
+    reference.addBoids(count, rng)
+    initialPos, initialVel = reference.pos.copy(), reference.vel.copy()
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        reference.step(1 / 60)
+    singleTime = (time.perf_counter() - start) / steps
+    print(f"{count} boids, {os.cpu_count()} cores")
+    print(f"single process: {singleTime * 1000:.0f} ms per step")
+
+    for numWorkers in workerCounts:
+        flock = ParallelFlockEngine(side, side, capacity=count, numWorkers=numWorkers)
+        flock.addBoids(count, rng)
+        flock.pos[:] = initialPos
+        flock.vel[:] = initialVel
+        try:
+            start = time.perf_counter()
+            for _ in range(steps):
+                flock.step(1 / 60)
+            parallelTime = (time.perf_counter() - start) / steps
+            difference = max(np.max(np.abs(flock.pos - reference.pos)), np.max(np.abs(flock.vel - reference.vel)))
+            print(f"{numWorkers} workers: {parallelTime * 1000:.0f} ms per step ({singleTime / parallelTime:.2f}x), "
+                  f"max difference to single process {difference:.1e}")
+        finally:
+            flock.close()
+
+
+def compareStaggered(count: int = 20000, intervals: tuple = (2, 4, 8), steps: int = 300, density: float = 50 / (1280 * 720)) -> None:
+    # step time and flock behavior of staggered steering against full updates, all runs start from the same flock.
+    # the order parameters are averaged over the run, a chaotic system diverges boid by boid but the
+    # collective behavior should stay close
+    side = np.sqrt(count / density)
+    initial = FlockEngine(side, side)
+    initial.addBoids(count, np.random.default_rng(0))
+    print(f"{count} boids, {steps} steps")
+    print(f"{'k':>3} {'per step':>9} {'polarization':>13} {'milling':>8} {'cohesion':>9} {'diff pol':>9} {'diff mill':>10} {'diff coh':>9}")
+
+    reference = None
+    for interval in (1,) + tuple(intervals):
+        flock = FlockEngine(side, side, capacity=count)
+        flock.addBoids(count)
+        flock.pos[:] = initial.pos
+        flock.vel[:] = initial.vel
+        flock.steeringInterval = interval
+        stepTime = 0.0
+        orderParameters = []
+        for _ in range(steps):
+            start = time.perf_counter()
+            flock.step(1 / 60)
+            stepTime += time.perf_counter() - start
+            orderParameters.append(flock.calcOrderParameters())
+
+        orderParameters = np.array(orderParameters)
+        if reference is None:
+            reference = orderParameters
+        # mean absolute difference of the time series against full updates
+        difference = np.mean(np.abs(orderParameters - reference), axis=0)
+        print(f"{interval:>3} {stepTime / steps * 1000:>6.1f} ms {orderParameters[:, 0].mean():>13.3f} {orderParameters[:, 1].mean():>8.3f} "
+              f"{orderParameters[:, 2].mean():>9.2f} {difference[0]:>9.3f} {difference[1]:>10.3f} {difference[2]:>9.2f}")
+
+
+if __name__ == "__main__":
+    # usage: python flockEngine.py [N]             parallel engine against single process
+    #        python flockEngine.py --staggered [N] staggered steering against full updates
+    args = [arg for arg in sys.argv[1:] if arg != "--staggered"]
+    if "--staggered" in sys.argv:
+        compareStaggered(int(args[0]) if args else 20000)
+    else:
+        compareEngines(int(args[0]) if args else 100000)
@@ -0,0 +1,149 @@
+import numpy as np
+
+# every integrator advances (pos, vel) by dt for an acceleration that depends only on position:
+#   newPos, newVel = integrator.step(pos, vel, dt, accFunc)
+
+class RungeKutta4:
+    name = "rk4"
+
+    def step(self, pos: np.ndarray, vel: np.ndarray, dt: float, accFunc) -> tuple:
+        k1Pos = vel
+        k1Vel = accFunc(pos)
+
+        k2Pos = vel + 0.5 * k1Vel * dt
+        k2Vel = accFunc(pos + 0.5 * k1Pos * dt)
+
+        k3Pos = vel + 0.5 * k2Vel * dt
+        k3Vel = accFunc(pos + 0.5 * k2Pos * dt)
+
+        k4Pos = vel + k3Vel * dt
+        k4Vel = accFunc(pos + k3Pos * dt)
+
+        # weighted average
+        newPos = pos + (dt / 6) * (k1Pos + 2*k2Pos + 2*k3Pos + k4Pos)
+        newVel = vel + (dt / 6) * (k1Vel + 2*k2Vel + 2*k3Vel + k4Vel)
+        return newPos, newVel
+
+
+class Leapfrog:
+    # drift-kick-drift leapfrog (position Verlet), symplectic and one force evaluation per step
+    name = "leapfrog"
+
+    def step(self, pos: np.ndarray, vel: np.ndarray, dt: float, accFunc) -> tuple:
+        halfPos = pos + 0.5 * dt * vel
+        newVel = vel + dt * accFunc(halfPos)
+        newPos = halfPos + 0.5 * dt * newVel
+        return newPos, newVel
+
+
+class Yoshida4:
+    # three leapfrog substeps with Yoshida's coefficients give a symplectic 4th order method
+    name = "yoshida4"
+
+    def __init__(self) -> None:
+        cubeRootTwo = 2 ** (1 / 3)
+        w1 = 1 / (2 - cubeRootTwo)
+        w0 = -cubeRootTwo / (2 - cubeRootTwo)
+        self.driftCoefficients = (w1 / 2, (w0 + w1) / 2, (w0 + w1) / 2, w1 / 2)
+        self.kickCoefficients = (w1, w0, w1)
+
+    def step(self, pos: np.ndarray, vel: np.ndarray, dt: float, accFunc) -> tuple:
+        for drift, kick in zip(self.driftCoefficients[:3], self.kickCoefficients):
+            pos = pos + drift * dt * vel
+            vel = vel + kick * dt * accFunc(pos)
+        pos = pos + self.driftCoefficients[3] * dt * vel
+        return pos, vel
+
+
+class DormandPrince45:
+    # embedded RK5(4) with error control, sub-steps adaptively to cover exactly dt
+    name = "dopri45"
+
+    A = (
+        (),
+        (1/5,),
+        (3/40, 9/40),
+        (44/45, -56/15, 32/9),
+        (19372/6561, -25360/2187, 64448/6561, -212/729),
+        (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+        (35/384, 0, 500/1113, 125/192, -2187/6784, 11/84),
+    )
+    # 5th order weights are the last row of A, these are the differences to the embedded 4th order weights
+    E = (71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40)
+
+    def __init__(self, relativeTolerance: float = 1e-6, absoluteTolerance: float = 1e-9, maxSubsteps: int = 10000) -> None:
+        self.relativeTolerance = relativeTolerance
+        self.absoluteTolerance = absoluteTolerance
+        self.maxSubsteps = maxSubsteps
+        # remembered between calls so a smooth run settles on a good step size
+        self.suggestedStep = None
+        self.rejectedSteps = 0
+        self.acceptedSteps = 0
+
+    def trialStep(self, pos: np.ndarray, vel: np.ndarray, h: float, accFunc) -> tuple:
+        posStages, velStages = [], []
+        for row in self.A:
+            stagePos = pos + h * sum((a * k for a, k in zip(row, posStages)), np.zeros_like(pos))
+            stageVel = vel + h * sum((a * k for a, k in zip(row, velStages)), np.zeros_like(vel))
+            posStages.append(stageVel)
+            velStages.append(accFunc(stagePos))
+
+        # the last stage is evaluated at the 5th order solution
+        newPos = pos + h * sum(a * k for a, k in zip(self.A[-1], posStages[:6]))
+        newVel = vel + h * sum(a * k for a, k in zip(self.A[-1], velStages[:6]))
+        errPos = h * sum(e * k for e, k in zip(self.E, posStages))
+        errVel = h * sum(e * k for e, k in zip(self.E, velStages))
+
+        scalePos = self.absoluteTolerance + self.relativeTolerance * np.maximum(np.abs(pos), np.abs(newPos))
+        scaleVel = self.absoluteTolerance + self.relativeTolerance * np.maximum(np.abs(vel), np.abs(newVel))
+        errRatios = np.concatenate((np.ravel(errPos / scalePos), np.ravel(errVel / scaleVel)))
+        errNorm = float(np.sqrt(np.mean(errRatios**2)))
+
+        return newPos, newVel, errNorm
+
+    def step(self, pos: np.ndarray, vel: np.ndarray, dt: float, accFunc) -> tuple:
+        remaining = dt
+        tolerance = 1e-12 * abs(dt)
+        # the controller's proposal, trial steps are clipped to what is left of dt but the proposal is not
+        h = dt if self.suggestedStep is None else self.suggestedStep
+
+        for _ in range(self.maxSubsteps):
+            if remaining <= tolerance:
+                break
+
+            trial = min(h, remaining)
+            newPos, newVel, errNorm = self.trialStep(pos, vel, trial, accFunc)
+            # standard step size controller, grow at most 5x and shrink at most 5x per attempt
+            factor = 5.0 if errNorm == 0 else min(5.0, max(0.2, 0.9 * errNorm ** -0.2))
+
+            if errNorm <= 1.0:
+                pos, vel = newPos, newVel
+                remaining -= trial
+                self.acceptedSteps += 1
+                # a step clipped to the end of dt says little about the step size, it can only keep or grow it
+                h = h * factor if trial == h else max(h, trial * factor)
+                self.suggestedStep = h
+            else:
+                self.rejectedSteps += 1
+                h = trial * factor
+
+        if remaining > tolerance:
+            raise RuntimeError(f"adaptive integrator needed more than {self.maxSubsteps} substeps for dt={dt}")
+
+        return pos, vel
+
+
+INTEGRATORS = {integrator.name: integrator for integrator in (RungeKutta4, Leapfrog, Yoshida4, DormandPrince45)}
+
+def getIntegrator(name: str):
+    if name not in INTEGRATORS:
+        raise ValueError(f"unknown integrator '{name}', expected one of {tuple(INTEGRATORS)}")
+    return INTEGRATORS[name]()
+
+
+def calcRelativeEnergyDrift(energies) -> float:
+    # largest relative deviation of the total energy from its initial value
+    energies = np.asarray(energies, dtype=float)
+    if len(energies) == 0 or energies[0] == 0:
+        return 0.0
+    return float(np.max(np.abs(energies - energies[0])) / abs(energies[0]))
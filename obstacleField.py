@@ -0,0 +1,120 @@
+import json
+import numpy as np
+
+# static obstacles as a signed distance field: distance to the nearest obstacle edge on a grid, negative inside.
+# the field and its gradient are computed once at load time, afterwards a boid only needs a bilinear lookup
+# instead of testing every obstacle
+
+def rasterizePolygons(polygons: list, width: float, height: float, cellSize: float) -> np.ndarray:
+    # inside mask [row, column] sampled at the cell centers, even-odd rule so holes and overlaps behave like a fill
+    numColumns, numRows = int(np.ceil(width / cellSize)), int(np.ceil(height / cellSize))
+    x = (np.arange(numColumns) + 0.5) * cellSize
+    y = (np.arange(numRows) + 0.5) * cellSize
+    mask = np.zeros((numRows, numColumns), dtype=bool)
+
+    for polygon in polygons:
+        vertices = np.asarray(polygon, dtype=float)
+        for (x0, y0), (x1, y1) in zip(vertices, np.roll(vertices, -1, axis=0)):
+            if y0 == y1:
+                continue
+            # rows whose center lies between the edge end points, and where the edge crosses them
+            isCrossed = (np.minimum(y0, y1) <= y) & (y < np.maximum(y0, y1))
+            crossX = x0 + (y[isCrossed] - y0) * (x1 - x0) / (y1 - y0)
+            # a ray to the right from every cell left of the crossing passes the edge once
+            mask[isCrossed] ^= x[None, :] < crossX[:, None]
+
+    return mask
+
+
+def distanceTransform(features: np.ndarray) -> np.ndarray:
+    # exact euclidean distance (in cells) of every cell to the nearest feature cell, inf if there is none.
+    # first the distance along each row, then the minimum of dy^2 + dx^2 down each column
+    numRows, numColumns = features.shape
+    columns = np.arange(numColumns)
+    # last feature to the left and first feature to the right of every cell
+    left = np.maximum.accumulate(np.where(features, columns, -np.inf), axis=1)
+    right = np.minimum.accumulate(np.where(features, columns, np.inf)[:, ::-1], axis=1)[:, ::-1]
+    rowDistSquared = np.minimum(columns - left, right - columns)**2
+
+    rows = np.arange(numRows)
+    distSquared = np.empty(features.shape)
+    # one block of rows at a time, the full rows x rows x columns broadcast can get large
+    for start in range(0, numRows, 64):
+        block = rows[start:start + 64]
+        distSquared[block] = np.min(rowDistSquared[None, :, :] + ((block[:, None] - rows[None, :])**2)[:, :, None], axis=1)
+
+    return np.sqrt(distSquared)
+
+
+class SignedDistanceField:
+    def __init__(self, mask: np.ndarray, cellSize: float) -> None:
+        # mask[row, column] is True inside an obstacle, every cell is cellSize pixels wide
+        self.mask = np.asarray(mask, dtype=bool)
+        self.cellSize = cellSize
+        self.polygons = []
+        # distance to the other side: outside cells measure to the nearest obstacle cell and the other way round,
+        # half a cell is taken off so the zero crossing sits on the boundary between the two cells
+        outsideDist = distanceTransform(self.mask)
+        insideDist = distanceTransform(~self.mask)
+        self.distance = np.where(self.mask, -(insideDist - 0.5), outsideDist - 0.5) * cellSize
+        # without any obstacle (or without free space) the field is flat, farther than anything on the grid
+        farAway = np.hypot(*self.mask.shape) * cellSize
+        self.distance[~np.isfinite(self.distance)] = farAway if not self.mask.any() else -farAway
+        gradientY, gradientX = np.gradient(self.distance, cellSize)
+        self.gradient = np.stack((gradientX, gradientY), axis=-1)
+
+    @classmethod
+    def fromPolygons(cls, polygons: list, width: float, height: float, cellSize: float = 4.0) -> "SignedDistanceField":
+        field = cls(rasterizePolygons(polygons, width, height, cellSize), cellSize)
+        field.polygons = [np.asarray(polygon, dtype=float) for polygon in polygons]
+        return field
+
+    @classmethod
+    def fromMask(cls, mask: np.ndarray, pixelsPerCell: int = 4) -> "SignedDistanceField":
+        # pixel mask [row, column], a cell counts as obstacle when most of its pixels are
+        mask = np.asarray(mask, dtype=bool)
+        numRows, numColumns = -(-mask.shape[0] // pixelsPerCell), -(-mask.shape[1] // pixelsPerCell)
+        padded = np.zeros((numRows * pixelsPerCell, numColumns * pixelsPerCell))
+        padded[:mask.shape[0], :mask.shape[1]] = mask
+        coverage = padded.reshape(numRows, pixelsPerCell, numColumns, pixelsPerCell).mean(axis=(1, 3))
+        return cls(coverage >= 0.5, float(pixelsPerCell))
+
+    @classmethod
+    def load(cls, path: str, width: float, height: float, cellSize: float = 4.0) -> "SignedDistanceField":
+        # a .json file holds a list of polygons ([[x, y], ...] in pixels), anything else is read as a mask image
+        if path.lower().endswith(".json"):
+            with open(path) as file:
+                return cls.fromPolygons(json.load(file), width, height, cellSize)
+
+        import pygame
+        image = pygame.image.load(path)
+        if image.get_size() != (int(width), int(height)):
+            image = pygame.transform.scale(image, (int(width), int(height)))
+        # dark or opaque pixels are obstacles, depending on whether the image has transparency
+        if image.get_flags() & pygame.SRCALPHA:
+            mask = pygame.surfarray.array_alpha(image) > 127
+        else:
+            mask = pygame.surfarray.array3d(image).mean(axis=2) < 128
+        return cls.fromMask(mask.T, int(cellSize))
+
+    def sample(self, pos: np.ndarray) -> tuple:
+        # bilinear lookup of the distance and the gradient at every position, positions off the grid are clamped
+        pos = np.asarray(pos, dtype=float).reshape(-1, 2)
+        numRows, numColumns = self.mask.shape
+        # cell centers are the sample points
+        gridX = np.clip(pos[:, 0] / self.cellSize - 0.5, 0, numColumns - 1)
+        gridY = np.clip(pos[:, 1] / self.cellSize - 0.5, 0, numRows - 1)
+        column = np.minimum(gridX.astype(np.int64), max(numColumns - 2, 0))
+        row = np.minimum(gridY.astype(np.int64), max(numRows - 2, 0))
+        nextColumn = np.minimum(column + 1, numColumns - 1)
+        nextRow = np.minimum(row + 1, numRows - 1)
+        tx = (gridX - column)[:, None]
+        ty = (gridY - row)[:, None]
+
+        def interpolate(values: np.ndarray) -> np.ndarray:
+            values = values.reshape(numRows, numColumns, -1)
+            top = values[row, column] * (1 - tx) + values[row, nextColumn] * tx
+            bottom = values[nextRow, column] * (1 - tx) + values[nextRow, nextColumn] * tx
+            return top * (1 - ty) + bottom * ty
+
+        return interpolate(self.distance)[:, 0], interpolate(self.gradient)
@@ -1,6 +1,8 @@
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
+from integrators import getIntegrator, calcRelativeEnergyDrift
+from polyline import simplifyIndices
 
 # Constants
 
@@ -14,6 +16,7 @@ r2 = R_earth + 1000e3   # Target orbit (1000 km altitude)
 dt = 1                  # Time step (seconds)
 t_max = 20000           # Total simulation time
 steps = int(t_max / dt)
+integrator = getIntegrator("rk4")   # "rk4", "leapfrog", "yoshida4" or "dopri45"
 
 
 # Initial Conditions 
@@ -33,27 +36,8 @@ def acceleration(r):
     r_norm = np.linalg.norm(r)
     return -mu * r / r_norm**3
 
-def rk4_step(r, v, dt):
-    a1 = acceleration(r)
-    k1_r = v
-    k1_v = a1
-
-    a2 = acceleration(r + 0.5*dt*k1_r)
-    k2_r = v + 0.5*dt*k1_v
-    k2_v = a2
-
-    a3 = acceleration(r + 0.5*dt*k2_r)
-    k3_r = v + 0.5*dt*k2_v
-    k3_v = a3
-
-    a4 = acceleration(r + dt*k3_r)
-    k4_r = v + dt*k3_v
-    k4_v = a4
-
-    r_next = r + (dt/6)*(k1_r + 2*k2_r + 2*k3_r + k4_r)
-    v_next = v + (dt/6)*(k1_v + 2*k2_v + 2*k3_v + k4_v)
-
-    return r_next, v_next
+def specific_energy(r, v):
+    return 0.5 * np.dot(v, v) - mu / np.linalg.norm(r)
 
 
 # Hohmann Delta-V Calculations 
@@ -68,6 +52,8 @@ print("Total Delta-v:", dv1 + dv2, "m/s")
 # Simulation Loop
 
 previous_r = np.linalg.norm(pos)
+# energy is only conserved between burns, so drift is measured per coasting segment
+segment_energies = [[]]
 
 for i in range(steps):
 
@@ -77,20 +63,25 @@ for i in range(steps):
     if not burn1_done:
         vel += dv1 * vel / np.linalg.norm(vel)
         burn1_done = True
+        segment_energies.append([])
 
     # Detect apoapsis (radius starts decreasing)
     if burn1_done and not burn2_done:
         if r_norm < previous_r:
             vel += dv2 * vel / np.linalg.norm(vel)
             burn2_done = True
+            segment_energies.append([])
             print("Second burn applied at t =", i*dt, "seconds")
 
     previous_r = r_norm
 
     trajectory.append(pos.copy())
-    pos, vel = rk4_step(pos, vel, dt)
+    segment_energies[-1].append(specific_energy(pos, vel))
+    pos, vel = integrator.step(pos, vel, dt, acceleration)
 
 trajectory = np.array(trajectory)
+energy_drift = max(calcRelativeEnergyDrift(energies) for energies in segment_energies)
+print(f"Max relative energy drift between burns ({integrator.name}): {energy_drift:.2e}")
 
 
 # Visualization
@@ -105,8 +96,17 @@ ax.add_patch(earth)
 line, = ax.plot([], [], 'r-', lw=1)
 point, = ax.plot([], [], 'ro')
 
+# the trajectory is simplified once in screen pixels, every frame draws the kept vertices up to the
+# current point plus the few raw points after the last kept vertex
+fig.canvas.draw()
+trajectory_pixels = ax.transData.transform(trajectory)
+path_indices = simplifyIndices(trajectory_pixels, tolerance=0.5, maxVertices=4096)
+print(f"Trajectory drawn with {len(path_indices)} of {len(trajectory)} points")
+
 def update(frame):
-    line.set_data(trajectory[:frame, 0], trajectory[:frame, 1])
+    kept = path_indices[:np.searchsorted(path_indices, frame)]
+    visible = np.concatenate((kept, np.arange(kept[-1] + 1 if len(kept) else 0, frame)))
+    line.set_data(trajectory[visible, 0], trajectory[visible, 1])
     point.set_data(
         [trajectory[frame, 0]],
         [trajectory[frame, 1]]
@@ -0,0 +1,72 @@
+import numpy as np
+
+# level of detail for long polylines (predicted orbits, trajectories): points that land on the same pixel
+# are dropped, the rest is simplified with Douglas-Peucker to a pixel tolerance and capped to a vertex budget.
+# everything works on indices, so callers can simplify in pixel space and draw the original data
+
+def dedupePixels(points: np.ndarray, pixelSize: float = 1.0) -> np.ndarray:
+    # indices of the points that land on a different pixel than the point before them
+    pixels = np.floor(np.asarray(points) / pixelSize).astype(np.int64)
+    changed = np.any(pixels[1:] != pixels[:-1], axis=1)
+    return np.flatnonzero(np.concatenate(([True], changed)))
+
+
+def calcSignificance(points: np.ndarray, tolerance: float) -> np.ndarray:
+    # Douglas-Peucker split distance of every vertex, 0 for vertices within tolerance of their segment.
+    # a vertex is never more significant than the split that exposed it, so the most significant k
+    # vertices are always a valid simplification on their own
+    points = np.asarray(points, dtype=float)
+    significance = np.zeros(len(points))
+    significance[[0, -1]] = np.inf
+    stack = [(0, len(points) - 1, np.inf)]
+
+    while stack:
+        start, end, parentSignificance = stack.pop()
+        if end - start < 2:
+            continue
+
+        segment = points[end] - points[start]
+        vecToInner = points[start + 1:end] - points[start]
+        segmentLength = np.hypot(*segment)
+        if segmentLength > 0:
+            dist = np.abs(segment[0] * vecToInner[:, 1] - segment[1] * vecToInner[:, 0]) / segmentLength
+        else:
+            # closed loop, measure from the shared end point
+            dist = np.hypot(vecToInner[:, 0], vecToInner[:, 1])
+
+        farthest = int(np.argmax(dist))
+        if dist[farthest] <= tolerance:
+            continue
+
+        split = start + 1 + farthest
+        significance[split] = min(dist[farthest], parentSignificance)
+        stack.append((start, split, significance[split]))
+        stack.append((split, end, significance[split]))
+
+    return significance
+
+
+def simplifyIndices(points: np.ndarray, tolerance: float = 0.5, maxVertices: int = 1024, pixelSize: float = 1.0) -> np.ndarray:
+    # indices of the vertices to draw, points are expected in pixels
+    points = np.asarray(points)
+    if len(points) < 3:
+        return np.arange(len(points))
+
+    unique = dedupePixels(points, pixelSize)
+    # the last point is kept even if it shares its pixel, so the path ends where it should
+    if unique[-1] != len(points) - 1:
+        unique = np.append(unique, len(points) - 1)
+    if len(unique) < 3:
+        return unique
+
+    significance = calcSignificance(points[unique], tolerance)
+    selected = np.flatnonzero(significance > 0)
+    if maxVertices is not None and len(selected) > maxVertices:
+        selected = np.sort(np.argsort(-significance, kind="stable")[:maxVertices])
+
+    return unique[selected]
+
+
+def simplifyPolyline(points: np.ndarray, tolerance: float = 0.5, maxVertices: int = 1024, pixelSize: float = 1.0) -> np.ndarray:
+    points = np.asarray(points)
+    return points[simplifyIndices(points, tolerance, maxVertices, pixelSize)]
@@ -0,0 +1,187 @@
+import sys
+import time
+import numpy as np
+
+# uniform grid for radius queries: points are sorted by cell once per frame, and a query only looks at the
+# 3x3 block of cells around it, so the cost grows with N times the local density instead of N^2
+
+# half of the 3x3 block, every pair of neighboring cells is visited exactly once
+HALF_NEIGHBORHOOD = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+FULL_NEIGHBORHOOD = tuple((dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+
+
+class SpatialHashGrid:
+    def __init__(self, cellSize: float) -> None:
+        self.cellSize = cellSize
+        self.pos = np.zeros((0, 2))
+        # points sorted by cell key, with the start and count of every occupied cell
+        self.order = np.zeros(0, dtype=np.int64)
+        self.cellKeys = np.zeros(0, dtype=np.int64)
+        self.cellStart = np.zeros(0, dtype=np.int64)
+        self.cellCount = np.zeros(0, dtype=np.int64)
+
+    @staticmethod
+    def calcCellKeys(cellX: np.ndarray, cellY: np.ndarray) -> np.ndarray:
+        # unbounded grid, the two cell coordinates are packed into one int64
+        return (cellX.astype(np.int64) << 32) + (cellY.astype(np.int64) & 0xFFFFFFFF)
+
+    @staticmethod
+    def splitCellKeys(keys: np.ndarray) -> tuple:
+        cellX = keys >> 32
+        cellY = (keys & 0xFFFFFFFF).astype(np.int64)
+        # the low half was stored as unsigned, restore negative cell coordinates
+        return cellX, np.where(cellY >= 2**31, cellY - 2**32, cellY)
+
+    def calcCells(self, pos: np.ndarray) -> tuple:
+        cells = np.floor(np.asarray(pos) / self.cellSize).astype(np.int64)
+        return cells[:, 0], cells[:, 1]
+
+    def build(self, pos: np.ndarray) -> None:
+        self.pos = np.asarray(pos, dtype=float)
+        keys = self.calcCellKeys(*self.calcCells(self.pos))
+        self.order = np.argsort(keys, kind="stable")
+        self.cellKeys, self.cellStart, self.cellCount = np.unique(keys[self.order], return_index=True, return_counts=True)
+
+    def findCells(self, keys: np.ndarray) -> tuple:
+        # position of every key among the occupied cells, and whether it is occupied at all
+        slots = np.minimum(np.searchsorted(self.cellKeys, keys), max(len(self.cellKeys) - 1, 0))
+        isOccupied = (self.cellKeys[slots] == keys) if len(self.cellKeys) else np.zeros(len(keys), dtype=bool)
+        return slots, isOccupied
+
+    @staticmethod
+    def expandRanges(startA: np.ndarray, countA: np.ndarray, startB: np.ndarray, countB: np.ndarray) -> tuple:
+        # every combination of an element of range A with an element of range B, for many range pairs at once
+        sizes = countA * countB
+        combo = np.repeat(np.arange(len(sizes)), sizes)
+        local = np.arange(len(combo)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        return startA[combo] + local // countB[combo], startB[combo] + local % countB[combo]
+
+    def pairsWithin(self, radius: float) -> tuple:
+        # all pairs (i, j) of points closer than radius, every pair once, radius must not exceed the cell size
+        if radius > self.cellSize:
+            raise ValueError(f"query radius {radius} is larger than the cell size {self.cellSize}")
+
+        cellX, cellY = self.splitCellKeys(self.cellKeys)
+        first, second = [], []
+
+        for dx, dy in HALF_NEIGHBORHOOD:
+            slots, isOccupied = self.findCells(self.calcCellKeys(cellX + dx, cellY + dy))
+            cellsA = np.flatnonzero(isOccupied)
+            cellsB = slots[isOccupied]
+            i, j = self.expandRanges(self.cellStart[cellsA], self.cellCount[cellsA], self.cellStart[cellsB], self.cellCount[cellsB])
+            if (dx, dy) == (0, 0):
+                # inside one cell only the pairs in sorted order
+                isUpper = i < j
+                i, j = i[isUpper], j[isUpper]
+            first.append(i)
+            second.append(j)
+
+        i = self.order[np.concatenate(first)]
+        j = self.order[np.concatenate(second)]
+        vecBetween = self.pos[i] - self.pos[j]
+        isClose = np.einsum("ij,ij->i", vecBetween, vecBetween) <= radius**2
+
+        return i[isClose], j[isClose]
+
+    def neighborsWithin(self, radius: float) -> tuple:
+        # neighbor lists of every point in compressed form: the neighbors of point k are neighbors[offsets[k]:offsets[k + 1]]
+        i, j = self.pairsWithin(radius)
+        source = np.concatenate((i, j))
+        target = np.concatenate((j, i))
+        order = np.argsort(source, kind="stable")
+        offsets = np.zeros(len(self.pos) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(source, minlength=len(self.pos)))
+
+        return offsets, target[order]
+
+    def queryPairs(self, queryPos: np.ndarray, radius: float, queryIds: np.ndarray = None) -> tuple:
+        # (query row, point) pairs within radius for a batch of query positions, cost grows with the batch only.
+        # queryIds are the point indices of queries that are grid points themselves, so they skip themselves
+        if radius > self.cellSize:
+            raise ValueError(f"query radius {radius} is larger than the cell size {self.cellSize}")
+        queryPos = np.asarray(queryPos, dtype=float).reshape(-1, 2)
+        # queries are sorted by cell as well, so the cell lookups happen once per query cell
+        queryKeys = self.calcCellKeys(*self.calcCells(queryPos))
+        queryOrder = np.argsort(queryKeys, kind="stable")
+        queryCellKeys, queryStart, queryCount = np.unique(queryKeys[queryOrder], return_index=True, return_counts=True)
+        cellX, cellY = self.splitCellKeys(queryCellKeys)
+        rows, points = [], []
+
+        for dx, dy in FULL_NEIGHBORHOOD:
+            slots, isOccupied = self.findCells(self.calcCellKeys(cellX + dx, cellY + dy))
+            cellsA = np.flatnonzero(isOccupied)
+            cellsB = slots[isOccupied]
+            q, k = self.expandRanges(queryStart[cellsA], queryCount[cellsA], self.cellStart[cellsB], self.cellCount[cellsB])
+            rows.append(q)
+            points.append(k)
+
+        q = queryOrder[np.concatenate(rows)]
+        points = self.order[np.concatenate(points)]
+        vecBetween = self.pos[points] - queryPos[q]
+        isClose = np.einsum("ij,ij->i", vecBetween, vecBetween) <= radius**2
+        if queryIds is not None:
+            isClose &= points != np.asarray(queryIds)[q]
+
+        return q[isClose], points[isClose]
+
+    def nearestWithin(self, queryPos: np.ndarray, radius: float) -> tuple:
+        # nearest point within radius of every query position, index -1 and distance inf if there is none
+        queryPos = np.asarray(queryPos, dtype=float).reshape(-1, 2)
+        nearest = np.full(len(queryPos), -1, dtype=np.int64)
+        nearestDist = np.full(len(queryPos), np.inf)
+        if len(self.pos) == 0 or len(queryPos) == 0:
+            return nearest, nearestDist
+
+        q, points = self.queryPairs(queryPos, radius)
+        distSquared = np.sum((self.pos[points] - queryPos[q])**2, axis=1)
+        # sort by query, then distance: the first entry of every query is its nearest point
+        byDistance = np.lexsort((distSquared, q))
+        q, points, distSquared = q[byDistance], points[byDistance], distSquared[byDistance]
+        isFirst = np.concatenate(([True], q[1:] != q[:-1])) if len(q) else np.zeros(0, dtype=bool)
+        nearest[q[isFirst]] = points[isFirst]
+        nearestDist[q[isFirst]] = np.sqrt(distSquared[isFirst])
+
+        return nearest, nearestDist
+
+
+def benchmark(counts: list, radius: float = 50.0, density: float = 50 / (1280 * 720)) -> None:
+    # constant density, like a flock that gets a larger world as it grows
+    from flockEngine import FlockEngine
+
+    rng = np.random.default_rng(0)
+    print(f"{'N':>7} {'grid build+lists':>17} {'brute force':>12} {'flock step':>11} {'per boid':>9}")
+    for count in counts:
+        side = np.sqrt(count / density)
+        pos = rng.uniform(0, side, (count, 2))
+
+        start = time.perf_counter()
+        grid = SpatialHashGrid(radius)
+        grid.build(pos)
+        offsets, neighbors = grid.neighborsWithin(radius)
+        gridTime = time.perf_counter() - start
+
+        # brute force reference only where it still fits in memory and time
+        bruteTime = float("nan")
+        if count <= 5000:
+            start = time.perf_counter()
+            distSquared = np.sum((pos[:, None, :] - pos[None, :, :])**2, axis=2)
+            np.fill_diagonal(distSquared, np.inf)
+            bruteCounts = np.count_nonzero(distSquared <= radius**2, axis=1)
+            bruteTime = time.perf_counter() - start
+            assert np.array_equal(bruteCounts, np.diff(offsets))
+
+        # one full flock step (neighbors, rules, speed clamp, walls) in a world of the same size
+        flock = FlockEngine(side, side, radius)
+        flock.addBoids(count, rng)
+        flock.pos[:] = pos
+        start = time.perf_counter()
+        flock.step(1 / 60)
+        stepTime = time.perf_counter() - start
+
+        print(f"{count:>7} {gridTime * 1000:>14.1f} ms {bruteTime * 1000:>9.1f} ms {stepTime * 1000:>8.0f} ms {stepTime / count * 1e6:>6.1f} us")
+
+
+if __name__ == "__main__":
+    # usage: python spatialHash.py [N ...]
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 2000, 5000, 10000, 20000]
+    benchmark(counts)
@@ -0,0 +1,50 @@
+import os
+import numpy as np
+
+# fixed-size ring buffer of per-tick records: the newest records stay in memory for the HUD and live plots without
+# rescanning the agents, and every record can also be appended to a csv file so a long run is kept in full
+
+
+class TelemetryBuffer:
+    def __init__(self, fields: tuple, capacity: int = 3600) -> None:
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self.records = np.full((capacity, len(self.fields)), np.nan)
+        # records ever written, the next one goes to row numRecorded % capacity
+        self.numRecorded = 0
+        self.streamFile = None
+
+    def __len__(self) -> int:
+        return min(self.numRecorded, self.capacity)
+
+    def stream(self, path: str) -> None:
+        # appends every following record to path, the header is only written into a new file
+        isNew = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.streamFile = open(path, "a", newline="")
+        if isNew:
+            self.streamFile.write(",".join(self.fields) + "\n")
+
+    def close(self) -> None:
+        if self.streamFile is not None:
+            self.streamFile.close()
+            self.streamFile = None
+
+    def record(self, values: tuple) -> None:
+        self.records[self.numRecorded % self.capacity] = values
+        self.numRecorded += 1
+        if self.streamFile is not None:
+            self.streamFile.write(",".join(format(float(value), ".10g") for value in values) + "\n")
+
+    def latest(self) -> dict:
+        # the newest record by field name, nan everywhere before the first one
+        if self.numRecorded == 0:
+            return dict.fromkeys(self.fields, float("nan"))
+        return dict(zip(self.fields, self.records[(self.numRecorded - 1) % self.capacity].tolist()))
+
+    def series(self, field: str) -> np.ndarray:
+        # the buffered values of one field, oldest first
+        column = self.records[:, self.fields.index(field)]
+        if self.numRecorded <= self.capacity:
+            return column[:self.numRecorded].copy()
+        start = self.numRecorded % self.capacity
+        return np.concatenate((column[start:], column[:start]))
@@ -0,0 +1,66 @@
+import time
+import pygame
+
+class FixedTimestep:
+    # decouples physics from the frame rate: every frame runs K fixed substeps and
+    # rendering interpolates between the last two physics states
+    def __init__(self, stepSize: float = 1 / 60, speedMultiplier: float = 1.0, maxSubsteps: int = 32, maxFrameTime: float = 0.25,
+                 maxPhysicsTime: float = 1 / 30) -> None:
+        self.stepSize = stepSize
+        self.speedMultiplier = speedMultiplier
+        self.maxSubsteps = maxSubsteps
+        # wall time the substeps of one frame may take, slow steps then cost simulated time instead of frame rate
+        self.maxPhysicsTime = maxPhysicsTime
+        # window drags and hitches are clamped instead of becoming one huge step
+        self.maxFrameTime = maxFrameTime
+        self.minSpeedMultiplier = 0.125
+        self.maxSpeedMultiplier = 16.0
+        self.accumulator = 0.0
+
+    def advance(self, frameTime: float) -> int:
+        self.accumulator += min(frameTime, self.maxFrameTime) * self.speedMultiplier
+        substeps = int(self.accumulator // self.stepSize)
+
+        if substeps > self.maxSubsteps:
+            # drop the backlog rather than spiralling into ever longer frames
+            substeps = self.maxSubsteps
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= substeps * self.stepSize
+
+        return substeps
+
+    def substeps(self, frameTime: float):
+        # yields once per substep of this frame and stops early once they used up maxPhysicsTime of wall time,
+        # the substeps left over are dropped together with the accumulator
+        numSubsteps = self.advance(frameTime)
+        start = time.perf_counter()
+        for substep in range(numSubsteps):
+            if substep > 0 and time.perf_counter() - start > self.maxPhysicsTime:
+                self.accumulator = 0.0
+                return
+            yield substep
+
+    def reset(self) -> None:
+        self.accumulator = 0.0
+
+    @property
+    def alpha(self) -> float:
+        # how far rendering is between the previous and the current physics state
+        return min(self.accumulator / self.stepSize, 1.0)
+
+    @staticmethod
+    def interpolate(previous, current, alpha: float):
+        return previous + (current - previous) * alpha
+
+    def setSpeedMultiplier(self, speedMultiplier: float) -> None:
+        self.speedMultiplier = pygame.math.clamp(speedMultiplier, self.minSpeedMultiplier, self.maxSpeedMultiplier)
+
+    def handleSpeedKeys(self, event: pygame.event.Event) -> bool:
+        # UP / DOWN doubles or halves the simulation speed, returns True when it changed
+        if event.type != pygame.KEYDOWN or event.key not in (pygame.K_UP, pygame.K_DOWN):
+            return False
+
+        oldSpeedMultiplier = self.speedMultiplier
+        self.setSpeedMultiplier(self.speedMultiplier * (2 if event.key == pygame.K_UP else 0.5))
+        return self.speedMultiplier != oldSpeedMultiplier
@@ -0,0 +1,103 @@
+import numpy as np
+from spatialHash import SpatialHashGrid
+
+# the agents of the virus simulation as arrays: position, state code and infection time per agent. the random walk,
+# infections and the recovery/death/immunity transitions run as masked operations over all agents, and the counts
+# of every state come from a bincount of the state array. dead agents stay in the arrays but no longer move
+
+HEALTHY, INFECTED, IMMUNE, DEAD = 0, 1, 2, 3
+NUM_STATES = 4
+
+
+class VirusEngine:
+    def __init__(self, width: float = 1280, height: float = 720, radius: float = 15, rng: np.random.Generator = None) -> None:
+        self.width = width
+        self.height = height
+        self.radius = radius
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.x = np.zeros(0)
+        self.y = np.zeros(0)
+        self.previousX = np.zeros(0)
+        self.previousY = np.zeros(0)
+        self.state = np.zeros(0, dtype=np.int8)
+        self.infectionTime = np.zeros(0)
+        self.infectionProbability = 0.5
+        self.immuneProbability = 0.3
+        self.deathProbability = 0.2
+        self.stayInfectedProbability = 0.3
+        self.minRecoveryTime = 20
+        # healthy agents by position, two agents touch when their centers are closer than two radii
+        self.contactGrid = SpatialHashGrid(2 * radius)
+        # events of the last step, for the markers: where an infection came from and where agents died
+        self.infectionSources = np.zeros((0, 2))
+        self.deathPositions = np.zeros((0, 2))
+
+    def __len__(self) -> int:
+        return len(self.state)
+
+    def add(self, count: int, state: int) -> None:
+        # agents at random positions, added once before the simulation starts
+        x = self.rng.integers(0, int(self.width - self.radius), count, endpoint=True).astype(float)
+        y = self.rng.integers(0, int(self.height - self.radius), count, endpoint=True).astype(float)
+        self.x = np.concatenate((self.x, x))
+        self.y = np.concatenate((self.y, y))
+        self.previousX = np.concatenate((self.previousX, x))
+        self.previousY = np.concatenate((self.previousY, y))
+        self.state = np.concatenate((self.state, np.full(count, state, dtype=np.int8)))
+        self.infectionTime = np.concatenate((self.infectionTime, np.zeros(count)))
+
+    def countStates(self) -> np.ndarray:
+        # number of healthy, infected, immune and dead agents
+        return np.bincount(self.state, minlength=NUM_STATES)
+
+    def move(self) -> None:
+        # a random step of up to 6 pixels on each axis, agents that leave the screen are put back inside
+        self.previousX[:] = self.x
+        self.previousY[:] = self.y
+        alive = np.flatnonzero(self.state != DEAD)
+        steps = self.rng.integers(-6, 6, (len(alive), 2), endpoint=True)
+        for pos, step, size in ((self.x, steps[:, 0], self.width), (self.y, steps[:, 1], self.height)):
+            moved = pos[alive] + step
+            moved[moved < self.radius] = self.radius
+            moved[moved > size] = size - self.radius
+            pos[alive] = moved
+
+    def findContacts(self) -> tuple:
+        # (infected, healthy) agent pairs that touch, the infected agents query a grid of the healthy ones
+        infected = np.flatnonzero(self.state == INFECTED)
+        healthy = np.flatnonzero(self.state == HEALTHY)
+        if len(infected) == 0 or len(healthy) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        self.contactGrid.build(np.stack((self.x[healthy], self.y[healthy]), axis=1))
+        rows, points = self.contactGrid.queryPairs(np.stack((self.x[infected], self.y[infected]), axis=1), 2 * self.radius)
+        return infected[rows], healthy[points]
+
+    def spreadInfection(self) -> None:
+        # one infection roll per contact, all drawn at once
+        sources, targets = self.findContacts()
+        isInfecting = self.rng.random(len(sources)) < self.infectionProbability
+        sources, targets = sources[isInfecting], targets[isInfecting]
+        self.infectionSources = np.stack((self.x[sources], self.y[sources]), axis=1)
+        self.state[targets] = INFECTED
+        self.infectionTime[targets] = 0
+
+    def updateStates(self, dt: float) -> None:
+        # infected agents that have been ill for minRecoveryTime become immune, die, stay infected for another round
+        # or become healthy again, with one roll each
+        infected = np.flatnonzero(self.state == INFECTED)
+        self.infectionTime[infected] += dt
+        due = infected[self.infectionTime[infected] >= self.minRecoveryTime]
+        roll = self.rng.random(len(due))
+        thresholds = np.cumsum((self.immuneProbability, self.deathProbability, self.stayInfectedProbability))
+        # 0 immune, 1 dead, 2 still infected, 3 healthy
+        outcome = np.searchsorted(thresholds, roll, side="right")
+        newStates = np.array([IMMUNE, DEAD, INFECTED, HEALTHY], dtype=np.int8)
+        self.state[due] = newStates[outcome]
+        self.infectionTime[due] = 0
+        dead = due[outcome == 1]
+        self.deathPositions = np.stack((self.x[dead], self.y[dead]), axis=1)
+
+    def step(self, dt: float) -> None:
+        self.move()
+        self.spreadInfection()
+        self.updateStates(dt)
@@ -1,142 +1,87 @@
 import pygame
 import numpy as np
-import random
 import math
+import sys
+import time
 from pygame_widgets.slider import Slider
 from pygame_widgets.textbox import TextBox
 from pygame_widgets import update
+from timestep import FixedTimestep
+from assetManager import assets
+from virusEngine import VirusEngine, HEALTHY, INFECTED, IMMUNE, DEAD
 
-class Agent():
-    def __init__(self, state, color):
-        self.state = state # healthy, infected, immune or dead
-        self.color = color
-        self.hasBeenInfected = True if self.state == "infected" else False
-        self.infectionTime = 0
-        self.radius = 15
-        
-        # random x and y    
-        WIDTH, HEIGHT = 1280, 720
-        self.x = random.randint(0, WIDTH - self.radius)
-        self.y = random.randint(0, HEIGHT - self.radius)
-        
-    def move(self):
-        randX = random.randint(-6, 6) 
-        randY = random.randint(-6, 6)
-        self.x += randX
-        self.y += randY
-        
-        # not going outside screen
-        WIDTH, HEIGHT = 1280, 720
-        if (self.x < self.radius): self.x = self.radius
-        if (self.y < self.radius): self.y = self.radius
-        if (self.x > WIDTH): self.x = WIDTH - self.radius
-        if (self.y > HEIGHT): self.y = HEIGHT - self.radius 
-        
 class Simulation():
-    def __init__(self):
+    def __init__(self, simSpeedMultiplier: float = 1.0, seed: int = None):
         self.healthyAgents = 50
         self.infectedAgents = 3
         self.immuneAgents = 3
         self.deadAgents = 0
-        self.healthyAgentsList = []
-        self.infectedAgentsList = []
-        self.immuneAgentsList = []
         self.deathMarkers = []
         self.inRangeMarkers = []
         self.colors = ["#F54927", "#93F06C", "#FFFFFF", "#808080"]
+        # color of every state code
+        self.stateColors = {HEALTHY: self.colors[1], INFECTED: self.colors[0], IMMUNE: self.colors[2], DEAD: self.colors[3]}
+        self.agentSprites = None
         self.textFont = None
         self.healthyAgentsText = None
         self.deadAgentsText = None
         self.immuneAgentsText = None
         self.infectedAgentsText = None
         self.timePassedText = None
-        self.infectionProbability = 0.5
-        self.immuneProbability = 0.3 # 30% prob. to become immune
-        self.deathProbability = 0.2
-        self.stayInfectedProbability = 0.3
-        self.minRecoveryTime = 20 
         self.timer = 0
+        self.timestep = FixedTimestep(1 / 60, speedMultiplier=simSpeedMultiplier)
+        # every agent lives in the arrays of the virus engine, which also holds the probabilities
+        self.engine = VirusEngine(1280, 720, radius=15, rng=np.random.default_rng(seed))
         
-    def spawnAgents(self, agentsCount, agentsList: list, state: str, color: str):
-        for _ in range(0, agentsCount):
-            agent = Agent(state=state, color=color)
-            agentsList.append(agent)
+    @property
+    def infectionProbability(self):
+        return self.engine.infectionProbability
     
-    def updateState(self, dt):
-        for agent in self.infectedAgentsList:
-            agent.infectionTime += dt
-            if agent.infectionTime >= self.minRecoveryTime:
-                p = self.getRandomProbability()
-                
-                if p < self.immuneProbability:
-                    # become immune
-                    agent.hasBeenInfected = False
-                    agent.state = "immune"
-                    agent.color = self.colors[2]
-                    self.infectedAgentsList.remove(agent)
-                    self.immuneAgentsList.append(agent)
-                    self.infectedAgents -= 1
-                    self.immuneAgents += 1
-                elif p < self.immuneProbability + self.deathProbability:
-                    # become dead
-                    agent.hasBeenInfected = False
-                    agent.state = "dead"
-                    agent.color = self.colors[3]
-                    self.deadAgents += 1
-                    self.deathMarkers.append((agent.x, agent.y))
-                    self.infectedAgentsList.remove(agent)
-                    self.infectedAgents -= 1
-                elif p < self.immuneProbability + self.deathProbability + self.stayInfectedProbability:
-                    agent.infectionTime = 0
-                else:
-                    # return to healthy
-                    agent.hasBeenInfected = False
-                    agent.state = "healthy"
-                    agent.color = self.colors[1]
-                    self.infectedAgentsList.remove(agent)
-                    self.healthyAgentsList.append(agent)
-                    self.infectedAgents -= 1
-                    self.healthyAgents += 1
-
-                agent.infectionTime = 0
-                
-    def moveAgents(self, agents):
-        for agent in agents:
-            agent.move()
+    @infectionProbability.setter
+    def infectionProbability(self, value):
+        self.engine.infectionProbability = value
+        
+    def spawnAgents(self, agentsCount, state: int):
+        self.engine.add(agentsCount, state)
+    
+    def updateCounts(self):
+        # counts come from the state array instead of being kept by hand
+        self.healthyAgents, self.infectedAgents, self.immuneAgents, self.deadAgents = self.engine.countStates().tolist()
     
     def createInRangeRadius(self, x, y):
-        timer = 0
         rangeRadiusDict = {"x": x, "y": y, "radius": 3, "life": 2}
         self.inRangeMarkers.append(rangeRadiusDict)
             
+    def step(self, dt):
+        # one fixed physics step
+        self.timer += dt
+        self.engine.step(dt)
+        for x, y in self.engine.infectionSources.tolist():
+            self.createInRangeRadius(x, y)
+        self.deathMarkers.extend(map(tuple, self.engine.deathPositions.tolist()))
+        self.updateCounts()
+    
+    def createAgentSprites(self):
+        # one circle per state, agents are blitted instead of drawn one by one
+        diameter = 2 * self.engine.radius
+        self.agentSprites = []
+        for state in range(len(self.stateColors)):
+            sprite = pygame.Surface((diameter, diameter), pygame.SRCALPHA)
+            pygame.draw.circle(sprite, self.stateColors[state], (self.engine.radius, self.engine.radius), self.engine.radius)
+            self.agentSprites.append(sprite)
+    
+    def drawAgents(self, screen, alpha):
+        # living agents between the last two physics states
+        engine = self.engine
+        alive = np.flatnonzero(engine.state != DEAD)
+        x = self.timestep.interpolate(engine.previousX[alive], engine.x[alive], alpha) - engine.radius
+        y = self.timestep.interpolate(engine.previousY[alive], engine.y[alive], alpha) - engine.radius
+        sprites = [self.agentSprites[state] for state in engine.state[alive].tolist()]
+        screen.blits(list(zip(sprites, zip(x.tolist(), y.tolist()))), doreturn=False)
+    
     def createTexts(self, screen, text, font, textColor, x, y):
         img = font.render(text, True, textColor)
         screen.blit(img, (x, y))
-    
-    def getRandomProbability(self):
-        return np.random.rand()
-        
-    def checkCollisions(self):
-        newlyInfected = []
-        for infected in self.infectedAgentsList:
-            infectedPos = pygame.Vector2(infected.x, infected.y)
-            
-            for healthy in self.healthyAgentsList:
-                healthyPos = pygame.Vector2(healthy.x, healthy.y)
-
-                if (infectedPos.distance_to(healthyPos) <= infected.radius + healthy.radius) and (self.getRandomProbability() < self.infectionProbability):
-                    healthy.color = self.colors[0]
-                    self.createInRangeRadius(infectedPos.x, infectedPos.y)
-                    newlyInfected.append(healthy)
-        
-        for agent in newlyInfected:
-            if agent in self.healthyAgentsList:
-                self.healthyAgentsList.remove(agent)
-                self.healthyAgents -= 1
-            if agent not in self.infectedAgentsList:
-                self.infectedAgentsList.append(agent)
-                self.infectedAgents += 1
-                agent.state = "infected"
         
     def update(self):
         pygame.init()
@@ -145,9 +90,10 @@ class Simulation():
         pygame.display.set_caption("Virus Simulation")
         clock = pygame.time.Clock()
         running = True
-        dt = 0
+        frameTime = 0
         
         self.textFont = pygame.font.SysFont("Anonymous", 30)
+        self.createAgentSprites()
         infectionProbSlider = Slider(screen, 950, 620, 300, 20, min=0, max=1, step=0.1, start=self.infectionProbability, 
                                      colour=(85, 85, 85), inactiveColour=(51, 51, 51), handleColour=(245, 73, 39), handleBorderColour=(255, 255, 255))
         sliderTextBox = TextBox(screen, 1000, 650, 200, 40, fontSize=18, textColour=(255, 255, 255), borderThickness=0, colour=(0, 0, 0))
@@ -157,30 +103,22 @@ class Simulation():
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
+                # UP / DOWN changes the simulation speed
+                if self.timestep.handleSpeedKeys(event):
+                    pygame.display.set_caption(f"Virus Simulation (x{self.timestep.speedMultiplier:g})")
                 
             screen.fill("black")
-            self.timer += dt
             
-            # create agents
-            for healthyAgent in self.healthyAgentsList:
-                pygame.draw.circle(screen, healthyAgent.color, (healthyAgent.x, healthyAgent.y), healthyAgent.radius)
+            # movement, collisions and state changes run in fixed substeps
+            for _ in self.timestep.substeps(frameTime):
+                self.step(self.timestep.stepSize)
             
-            # draw agents            
-            for immune in self.immuneAgentsList:
-                pygame.draw.circle(screen, immune.color, (immune.x, immune.y), immune.radius)
+            # draw agents between the last two physics states
+            self.drawAgents(screen, self.timestep.alpha)
 
-            for infected in self.infectedAgentsList:
-                pygame.draw.circle(screen, infected.color, (infected.x, infected.y), infected.radius)
-
-            for (x, y) in self.deathMarkers:
-                deathMarker = pygame.image.load("C:/Users/chris/Desktop/Informatica/Simulations/Images/red cross.png").convert_alpha()
-                deathMarker = pygame.transform.scale(deathMarker, (30, 30))
-                screen.blit(deathMarker, (x, y))
-            
-            # move agents
-            self.moveAgents(self.healthyAgentsList)
-            self.moveAgents(self.immuneAgentsList)
-            self.moveAgents(self.infectedAgentsList)
+            # loaded and scaled once, later frames get the cached surface
+            deathMarker = assets.getImage("Images/red cross.png", (30, 30))
+            screen.blits([(deathMarker, position) for position in self.deathMarkers], doreturn=False)
             
             # texts to display
             self.healthyAgentsText = self.createTexts(screen, f"Healthy agents: {self.healthyAgents}", self.textFont, "#FFFFFF", x=50, y=20)
@@ -189,32 +127,65 @@ class Simulation():
             self.deadAgentsText = self.createTexts(screen, f"Dead agents: {self.deadAgents}", self.textFont, "#FFFFFF", x=50, y=110)
             self.timePassedText = self.createTexts(screen, f"Time Passed: {self.timer:.02f}", self.textFont, "#FFFFFF", x=1000, y=20)
             
-            # collisions and draw in-range markers
-            self.checkCollisions()
-            
+            # draw in-range markers
             for marker in self.inRangeMarkers:
-                marker["radius"] += 30 * dt
-                marker["life"] -= dt
+                marker["radius"] += 30 * frameTime
+                marker["life"] -= frameTime
                 pygame.draw.circle(screen, "#F59887", (marker["x"], marker["y"]), int(marker["radius"]), width=2)
-                if marker["life"] <= 0:
-                    self.inRangeMarkers.remove(marker)
-            
-            self.updateState(dt)
+            self.inRangeMarkers = [marker for marker in self.inRangeMarkers if marker["life"] > 0]
             
             update([infectionProbSlider, sliderTextBox])
             sliderTextBox.setText(f"Infection Prob: {infectionProbSlider.getValue():.2f}")
             self.infectionProbability = infectionProbSlider.getValue()
             pygame.display.update()
             pygame.display.flip()
-            dt = clock.tick(60) / 1000
+            frameTime = clock.tick(60) / 1000
 
         
         pygame.quit()
         
 
+def benchmark(numAgents: int = 100000, infectedShare: float = 0.1, numSamples: int = 20, numSteps: int = 10):
+    # one engine step at the old density (56 agents on 1280x720) in a world grown with the agent count, against the
+    # old pairwise Vector2 contact checks, timed on a sample of infected agents and scaled up
+    scale = math.sqrt(numAgents / 56)
+    engine = VirusEngine(1280 * scale, 720 * scale, rng=np.random.default_rng(0))
+    numInfected = int(numAgents * infectedShare)
+    engine.add(numAgents - numInfected, HEALTHY)
+    engine.add(numInfected, INFECTED)
+
+    engine.step(1 / 60)
+    start = time.perf_counter()
+    for _ in range(numSteps):
+        engine.step(1 / 60)
+    stepTime = (time.perf_counter() - start) / numSteps
+
+    healthyPos = list(zip(engine.x[engine.state == HEALTHY].tolist(), engine.y[engine.state == HEALTHY].tolist()))
+    infected = np.flatnonzero(engine.state == INFECTED)
+    start = time.perf_counter()
+    for index in infected[:numSamples].tolist():
+        infectedPos = pygame.Vector2(engine.x[index], engine.y[index])
+        for x, y in healthyPos:
+            infectedPos.distance_to(pygame.Vector2(x, y)) <= 2 * engine.radius
+    pairwiseTime = (time.perf_counter() - start) / numSamples * len(infected)
+
+    counts = engine.countStates()
+    print(f"{numAgents} agents, {counts[HEALTHY]} healthy, {counts[INFECTED]} infected, {len(engine.infectionSources)} infections in the last step")
+    print(f"engine step (walk, contacts, transitions): {stepTime * 1000:.1f} ms (mean of {numSteps})")
+    print(f"pairwise contact checks: {pairwiseTime * 1000:.0f} ms per step (estimated from {numSamples} infected agents), {pairwiseTime / stepTime:.0f}x slower")
+
+
 if __name__ == "__main__":
+    # usage: python virusSimulation.py [--benchmark [N]]
+    if "--benchmark" in sys.argv:
+        args = sys.argv[sys.argv.index("--benchmark") + 1:]
+        if args:
+            benchmark(int(args[0]))
+        else:
+            benchmark()
+        sys.exit()
     simulation = Simulation()
-    simulation.spawnAgents(simulation.healthyAgents, simulation.healthyAgentsList, "healthy", simulation.colors[1])
-    simulation.spawnAgents(simulation.immuneAgents, simulation.immuneAgentsList, "immune", simulation.colors[2])
-    simulation.spawnAgents(simulation.infectedAgents, simulation.infectedAgentsList, "infected", simulation.colors[0])
+    simulation.spawnAgents(simulation.healthyAgents, HEALTHY)
+    simulation.spawnAgents(simulation.immuneAgents, IMMUNE)
+    simulation.spawnAgents(simulation.infectedAgents, INFECTED)
     simulation.update()
\ No newline at end of file